@@ -0,0 +1,66 @@
+"""
+Cold-start time for loading the game data from JSON versus the binary bundle.
+Each measurement runs in a fresh interpreter so nothing is cached between runs; package
+import time is common to both paths and excluded.
+
+    python -m benchmarks.cold_start [--repeat 5]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+_ACTIONS = ("Action-Mining", "Action-Foraging", "Action-Fishing")
+
+_JSON_PATH = """
+import time
+from idlescape.character import select_items
+from idlescape.gathering import select_action_locations
+t0 = time.perf_counter()
+items = select_items({item_file!r})
+locations = [select_action_locations({location_file!r}, items, a) for a in {actions!r}]
+print(time.perf_counter() - t0)
+"""
+
+_BUNDLE_PATH = """
+import time
+from idlescape.bundle import load_bundle
+from idlescape.character import select_items
+from idlescape.gathering import select_action_locations
+t0 = time.perf_counter()
+bundle = load_bundle({bundle_file!r}, {item_file!r}, {location_file!r})
+items = select_items(bundle)
+locations = [select_action_locations(bundle, items, a) for a in {actions!r}]
+print(time.perf_counter() - t0)
+"""
+
+
+def _time_fresh(code):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([os.getcwd(), os.environ.get('PYTHONPATH', '')]))
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, env=env, check=True)
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--item-file', default='data/items.json')
+    parser.add_argument('--location-file', default='data/locations.json')
+    parser.add_argument('--repeat', type=int, default=5)
+    options = parser.parse_args(args)
+
+    from idlescape.bundle import compile_bundle, BUNDLE_EXTENSION
+    with tempfile.TemporaryDirectory() as tmp:
+        bundle_file = os.path.join(tmp, 'gamedata' + BUNDLE_EXTENSION)
+        compile_bundle(options.item_file, options.location_file, bundle_file)
+        fields = dict(item_file=options.item_file, location_file=options.location_file,
+                      bundle_file=bundle_file, actions=_ACTIONS)
+        for (name, template) in (('json', _JSON_PATH), ('bundle', _BUNDLE_PATH)):
+            times = np.array([_time_fresh(template.format(**fields)) for _ in range(options.repeat)])
+            print(f'{name:>8}: median {np.median(times) * 1000:8.2f} ms  min {times.min() * 1000:8.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Latency of the fishing node kernels: numba Monte Carlo, vectorized NumPy Monte Carlo
+(the path Pyodide runs), the seeded multi-core stream kernels (node_moments) and the exact
+distribution, over a few representative nodes.
+
+    python -m benchmarks.fishing_kernels [--trials 10000] [--repeat 5]
+"""
+import argparse
+import time
+
+from idlescape import fishing
+
+# (base_chance, zone_level, min_base, max_base, fishing_level, bait_power, fishing_enchant)
+NODES = [
+    (0.5, 1, 2, 4, 10, 0, 0),
+    (0.6, 1, 5, 12, 60, 40, 0),
+    (0.4, 40, 5, 12, 120, 150, 2),
+    (0.7, 85, 10, 20, 200, 300, 4),
+]
+
+
+def _best_time(func, args, repeat):
+    func(*args)  # warm up (numba compilation)
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        value = func(*args)
+        times.append(time.perf_counter() - t0)
+    return min(times), value
+
+
+def _uncached(func):
+    def wrapper(*args):
+        fishing.node_size_distribution.cache_clear()
+        return func(*args)
+
+    return wrapper
+
+
+def _moments(tries):
+    def size_kernel(zone_level, min_base, max_base, fishing_level, bait_power, trials):
+        key = fishing.node_key(0, zone_level, min_base, max_base)
+        return fishing.node_moments(key, zone_level, min_base, max_base, fishing_level, bait_power, trials)[0] / trials
+
+    def tries_kernel(base_chance, zone_level, min_base, max_base, fishing_level, bait_power, fishing_enchant, trials):
+        key = fishing.node_key(0, zone_level, min_base, max_base)
+        table = fishing.tries_table(base_chance, fishing_enchant)
+        return fishing.node_moments(key, zone_level, min_base, max_base, fishing_level, bait_power, trials,
+                                    tries=table)[0] / trials
+
+    return tries_kernel if tries else size_kernel
+
+
+def kernels():
+    ret = {
+        'numpy': (fishing._calculate_node_resources_numpy_fishing, fishing._average_tries_to_finish_node_numpy_fishing),
+        'exact': (_uncached(fishing._calculate_node_resources_exact_fishing),
+                  _uncached(fishing._average_tries_to_finish_node_exact_fishing)),
+    }
+    if fishing.HAS_NUMBA:
+        ret['numba'] = (fishing._calculate_node_resources_jit_fishing, fishing._average_tries_to_finish_node_jit_fishing)
+    ret['stream'] = (_moments(False), _moments(True))
+    return ret
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--trials', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    options = parser.parse_args(args)
+    print(f'{"kernel":>6} {"node":>34} {"size ms":>9} {"size":>8} {"tries ms":>9} {"tries":>8}')
+    for (name, (size_kernel, tries_kernel)) in kernels().items():
+        for node in NODES:
+            size_time, size = _best_time(size_kernel, node[1:6] + (options.trials,), options.repeat)
+            tries_time, tries = _best_time(tries_kernel, node + (options.trials,), options.repeat)
+            print(f'{name:>6} {str(node):>34} {size_time * 1e3:9.3f} {size:8.3f} {tries_time * 1e3:9.3f} {tries:8.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,4 @@
+from .gamedata import GameData
 from .character import Character
 from .gathering import Location, Node, NodeLoot
 from .fishing import Fishing
@@ -6,4 +7,11 @@ from .mining import Mining
 from .sequencer import *
 from .combat import *
 from .smithing import *
-from .dashboard import *
+
+
+def __getattr__(name):
+    # The dashboard pulls in panel (and pandas); import it on first use only
+    if name == 'InteractiveCharacter':
+        from .dashboard import InteractiveCharacter
+        return InteractiveCharacter
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
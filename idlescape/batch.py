@@ -0,0 +1,307 @@
+"""
+Many characters evaluated at once.
+
+A CharacterBatch holds one array per numeric Character attribute and per enchantment. The gathering
+classes evaluate all of it in one call:
+
+    batch = CharacterBatch.from_characters(players)
+    rates = Mining(players[0]).batch_rates(batch)
+    rates.experience_rate  # (n_characters, n_zones) experience per hour
+
+As a command, it streams JSONL character profiles and writes the rates of every profile, skill and
+zone as JSONL or CSV. A profile holds Character and EquipmentSet keywords, plus an optional id:
+
+    {"id": "alice", "mining_level": 80, "pickaxe": "Runite Pickaxe", "enchantments": {"haste": 2}}
+
+    python -m idlescape.batch profiles.jsonl --skills mining,fishing --workers 4 --format csv
+"""
+import argparse
+import csv
+import json
+import multiprocessing
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import numpy as np
+
+from .character import Character, EquipmentSet
+from .gamedata import GameData
+
+# Numeric Character attributes and their defaults
+ATTRIBUTES = {
+    'fishing_level': 1, 'fishing_bonus': 0, 'bait_fishing_bonus': 0, 'fishing_set_bonus': 0.0,
+    'bait_preservation': 0, 'bait_power': 0, 'bait_bait_power': 0, 'reel_power': 0, 'bait_reel_power': 0,
+    'bonus_rarity': 0, 'bait_bonus_rarity': 0,
+    'mining_level': 1, 'mining_bonus': 0, 'mining_set_bonus': 0.0,
+    'foraging_level': 1, 'foraging_bonus': 0, 'foraging_set_bonus': 0.0,
+    'smithing_level': 1, 'smithing_mastery': 0, 'smithing_bonus': 0,
+}
+
+
+class Columns:
+    """
+    Character stand-in whose attributes are (n, 1) columns, so the skill formulas broadcast over
+    characters (rows) and zones or nodes (columns). Enchantments default to zero.
+    """
+
+    class Enchantments(dict):
+        def get(self, key, default=0):
+            return dict.get(self, key, default)
+
+    def __init__(self, batch):
+        for (k, v) in batch.attributes.items():
+            setattr(self, k, v[:, np.newaxis])
+        self.enchantments = self.Enchantments({k: v[:, np.newaxis] for (k, v) in batch.enchantments.items()})
+        self.game_data = batch.game_data
+        self.item_data = batch.game_data.items
+
+
+class CharacterBatch:
+    """
+    Characters as columns: attributes[name] and enchantments[name] are arrays with one value per
+    character. Attributes left out take the Character defaults, enchantments left out are zero.
+    """
+
+    def __init__(self, size, game_data=None, enchantments=None, **attributes):
+        self.size = size
+        self.game_data = GameData.resolve(game_data)
+        self.attributes = {k: np.broadcast_to(np.asarray(attributes.get(k, v), dtype=float), (size,))
+                           for (k, v) in ATTRIBUTES.items()}
+        self.enchantments = {k: np.broadcast_to(np.asarray(v, dtype=float), (size,))
+                             for (k, v) in (enchantments or dict()).items()}
+
+    @classmethod
+    def from_characters(cls, characters, game_data=None):
+        characters = list(characters)
+        if game_data is None and len(characters) > 0:
+            game_data = characters[0].game_data
+        attributes = {k: [getattr(c, k, v) for c in characters] for (k, v) in ATTRIBUTES.items()}
+        names = sorted({k for c in characters for k in c.enchantments})
+        enchantments = {k: [c.enchantments.get(k, 0) for c in characters] for k in names}
+        return cls(len(characters), game_data, enchantments, **attributes)
+
+    @classmethod
+    def from_records(cls, records, game_data=None):
+        """
+        From dicts of Character attributes, with enchantments in an 'enchantments' dict
+        """
+        records = list(records)
+        attributes = {k: [r.get(k, v) for r in records] for (k, v) in ATTRIBUTES.items()}
+        names = sorted({k for r in records for k in r.get('enchantments', dict())})
+        enchantments = {k: [r.get('enchantments', dict()).get(k, 0) for r in records] for k in names}
+        return cls(len(records), game_data, enchantments, **attributes)
+
+    def __len__(self):
+        return self.size
+
+    def __getattr__(self, name):
+        attributes = self.__dict__.get('attributes', dict())
+        if name in attributes:
+            return attributes[name]
+        raise AttributeError(name)
+
+    def columns(self):
+        return Columns(self)
+
+    def subset(self, index):
+        index = np.asarray(index, dtype=np.int64)
+        return CharacterBatch(len(index), self.game_data, {k: v[index] for (k, v) in self.enchantments.items()},
+                              **{k: v[index] for (k, v) in self.attributes.items()})
+
+    def character(self, i):
+        """
+        Character i as a Character
+        """
+        character = Character(game_data=self.game_data,
+                              enchantments={k: _number(v[i]) for (k, v) in self.enchantments.items()})
+        for (k, v) in self.attributes.items():
+            setattr(character, k, _number(v[i]))
+        return character
+
+    def unique(self, attributes=(), enchantments=()):
+        """
+        (first, inverse): index of the first character with each distinct combination of the given
+        attributes and enchantments, and the combination of every character
+        """
+        zeros = np.zeros(self.size)
+        keys = [self.attributes[k] for k in attributes] + [self.enchantments.get(k, zeros) for k in enchantments]
+        if len(keys) == 0:
+            return np.zeros(min(1, self.size), dtype=np.int64), np.zeros(self.size, dtype=np.int64)
+        (_, first, inverse) = np.unique(np.stack(keys, axis=1), axis=0, return_index=True, return_inverse=True)
+        return first, inverse.reshape(-1)
+
+
+def _number(value):
+    value = float(value)
+    return int(value) if value.is_integer() else value
+
+
+# Command line batch evaluation
+FIELDS = ['id', 'skill', 'zone', 'experience_rate', 'action_rate']
+
+
+def skill_classes():
+    from .fishing import Fishing
+    from .foraging import Foraging
+    from .mining import Mining
+    return {'mining': Mining, 'foraging': Foraging, 'fishing': Fishing}
+
+
+class BatchEvaluator:
+    """
+    Rates of chunks of profiles for a set of skills and zones, with the game data and skill
+    objects (e.g. the fishing backend) set up once
+    """
+
+    def __init__(self, game_data, skills, zones=None, best=False, **kwargs):
+        self.game_data = game_data
+        template = Character(game_data=game_data)
+        classes = skill_classes()
+        self.actions = {skill: classes[skill](template, game_data, **kwargs) for skill in skills}
+        self.zones = None if zones is None else set(zones)
+        self.best = best
+        self.slots = EquipmentSet(game_data.items, game_data=game_data).slots
+
+    def character(self, profile):
+        character = Character(game_data=self.game_data, **profile)
+        if any(slot in profile for slot in self.slots):
+            character.assign_equipment(EquipmentSet(self.game_data.items, game_data=self.game_data, **profile))
+        return character
+
+    def evaluate(self, chunk):
+        """
+        Output rows of a chunk of (index, profile) pairs
+        """
+        ids = [profile.get('id', index) for (index, profile) in chunk]
+        batch = CharacterBatch.from_characters([self.character(profile) for (index, profile) in chunk],
+                                               self.game_data)
+        rows = []
+        for (skill, action) in self.actions.items():
+            rates = action.batch_rates(batch)
+            columns = [j for (j, zone) in enumerate(rates.locations) if self.zones is None or zone in self.zones]
+            for (i, profile_id) in enumerate(ids):
+                selected = columns
+                if self.best and len(columns) > 0:
+                    selected = [columns[int(np.argmax(rates.experience_rate[i, columns]))]]
+                rows.extend({'id': profile_id, 'skill': skill, 'zone': rates.locations[j],
+                             'experience_rate': float(rates.experience_rate[i, j]),
+                             'action_rate': float(rates.action_rate[i, j])} for j in selected)
+        return rows
+
+
+_worker = dict()
+
+
+def _init_worker(args, kwargs):
+    _worker['evaluator'] = BatchEvaluator(*args, **kwargs)
+
+
+def _evaluate_worker(chunk):
+    return _worker['evaluator'].evaluate(chunk)
+
+
+def read_profiles(stream):
+    """
+    (line number, profile) of every non-blank line of a JSONL stream
+    """
+    for (number, line) in enumerate(stream, 1):
+        if line.strip():
+            try:
+                yield number, json.loads(line)
+            except json.JSONDecodeError as error:
+                raise ValueError(f'line {number}: {error}') from None
+
+
+def chunks(iterable, size):
+    iterator = iter(iterable)
+    chunk = list(islice(iterator, size))
+    while len(chunk) > 0:
+        yield chunk
+        chunk = list(islice(iterator, size))
+
+
+def evaluate_profiles(profiles, evaluator_args, workers=1, chunk_size=256, window=None):
+    """
+    Output rows of (index, profile) pairs, in input order. With several workers the chunks are
+    evaluated on a process pool, at most `window` chunks (default 2 per worker) in flight.
+    """
+    (args, kwargs) = evaluator_args
+    if workers <= 1:
+        evaluator = BatchEvaluator(*args, **kwargs)
+        for chunk in chunks(profiles, chunk_size):
+            yield from evaluator.evaluate(chunk)
+        return
+    window = window or 2 * workers
+    pending = deque()
+    # spawn: forking after numba's threading layer has started is not safe
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker,
+                             initargs=(args, kwargs)) as executor:
+        for chunk in chunks(profiles, chunk_size):
+            if len(pending) >= window:
+                yield from pending.popleft().result()
+            pending.append(executor.submit(_evaluate_worker, chunk))
+        while len(pending) > 0:
+            yield from pending.popleft().result()
+
+
+class _Writer:
+    def __init__(self, stream, output_format):
+        self.stream = stream
+        self.csv = csv.DictWriter(stream, FIELDS) if output_format == 'csv' else None
+        if self.csv is not None:
+            self.csv.writeheader()
+
+    def write(self, row):
+        if self.csv is not None:
+            self.csv.writerow(row)
+        else:
+            self.stream.write(json.dumps(row) + '\n')
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input', nargs='?', default='-', help='JSONL profiles (default: stdin)')
+    parser.add_argument('-o', '--output', default='-', help='output file (default: stdout)')
+    parser.add_argument('--format', choices=['jsonl', 'csv'], default='jsonl')
+    parser.add_argument('--skills', default='mining,foraging,fishing')
+    parser.add_argument('--zones', default=None, help='comma separated zone names (default: all)')
+    parser.add_argument('--best', action='store_true', help='only the best zone of every skill')
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--chunk-size', type=int, default=256)
+    parser.add_argument('--window', type=int, default=None, help='chunks in flight (default: 2 per worker)')
+    parser.add_argument('--items', default='data/items.json')
+    parser.add_argument('--locations', default='data/locations.json')
+    parser.add_argument('--bundle', default=None)
+    parser.add_argument('--backend', default=None, help='fishing backend (default: montecarlo)')
+    parser.add_argument('--seed', type=int, default=0, help='fishing Monte Carlo seed')
+    options = parser.parse_args(args)
+    skills = [s.strip() for s in options.skills.split(',') if s.strip()]
+    unknown = set(skills) - set(skill_classes())
+    if len(unknown) > 0:
+        parser.error(f'unknown skills: {", ".join(sorted(unknown))}')
+    zones = None if options.zones is None else [z.strip() for z in options.zones.split(',')]
+    game_data = GameData.load(item_file=options.items, location_file=options.locations, bundle_file=options.bundle)
+    kwargs = {'seed': options.seed}
+    if options.backend is not None:
+        kwargs['backend'] = options.backend
+    evaluator_args = ((game_data, skills, zones, options.best), kwargs)
+    source = sys.stdin if options.input == '-' else open(options.input)
+    sink = sys.stdout if options.output == '-' else open(options.output, 'w', newline='')
+    try:
+        writer = _Writer(sink, options.format)
+        rows = evaluate_profiles(read_profiles(source), evaluator_args, options.workers, options.chunk_size,
+                                 options.window)
+        for row in rows:
+            writer.write(row)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if sink is not sys.stdout:
+            sink.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,312 @@
+"""
+Precompiled binary game data bundle.
+
+`compile_bundle` turns items.json and locations.json into a single file of columnar
+NumPy arrays (items, locations, nodes, loot) plus a string table. `load_bundle`
+memory-maps it, so every array is a zero-copy view into the file, and checks the bundle
+version and the hashes of the JSON it was compiled from.
+
+    python -m idlescape.bundle data/items.json data/locations.json -o data/gamedata.idlb
+"""
+import argparse
+import hashlib
+import json
+import os
+from collections.abc import Mapping
+
+import numpy as np
+
+BUNDLE_VERSION = 1
+BUNDLE_EXTENSION = '.idlb'
+_MAGIC = b'IDLBNDL\x00'
+_ALIGN = 64
+
+
+class BundleVersionError(ValueError):
+    pass
+
+
+def file_hash(path):
+    with open(path, 'rb') as ff:
+        return hashlib.sha256(ff.read()).hexdigest()
+
+
+class _StringTable:
+    def __init__(self):
+        self.strings = []
+        self.index = dict()
+
+    def __call__(self, value):
+        value = str(value)
+        if value not in self.index:
+            self.index[value] = len(self.strings)
+            self.strings.append(value)
+        return self.index[value]
+
+    def arrays(self):
+        encoded = [s.encode('utf-8') for s in self.strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(e) for e in encoded])
+        return np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets
+
+
+def _required_level(location):
+    try:
+        return location["accessRequirements"]["requiredSkills"][0]["level"]
+    except (KeyError, IndexError, TypeError):
+        return 0
+
+
+def compile_bundle(item_file, location_file, output):
+    """
+    Compile the item and location JSON into a bundle at `output`
+    """
+    with open(item_file) as jj:
+        items = json.load(jj)
+    with open(location_file) as jj:
+        locations = json.load(jj)
+    strings = _StringTable()
+    columns = dict()
+
+    # Items: a few hot columns plus the full record as compact JSON for select_items
+    item_keys = list(items.keys())
+    records = [json.dumps(items[k], separators=(',', ':')).encode('utf-8') for k in item_keys]
+    columns['item_id'] = np.array([int(k) for k in item_keys], dtype=np.int64)
+    columns['item_name'] = np.array([strings(items[k]['name'].replace("'", "")) for k in item_keys], dtype=np.int32)
+    columns['item_class'] = np.array([strings(items[k].get('class', '')) for k in item_keys], dtype=np.int32)
+    columns['item_experience'] = np.array([items[k].get('experience', np.nan) for k in item_keys], dtype=np.float64)
+    columns['item_record'] = np.frombuffer(b''.join(records), dtype=np.uint8)
+    columns['item_record_offset'] = np.concatenate([[0], np.cumsum([len(r) for r in records])]).astype(np.int64)
+
+    # Locations -> nodes -> loot, flattened with offset arrays
+    loc_cols = {k: [] for k in ('name', 'id', 'action', 'duration', 'level')}
+    node_cols = {k: [] for k in ('id', 'frequency', 'max_frequency', 'min_base', 'max_base')}
+    loot_cols = {k: [] for k in ('id', 'frequency', 'max_frequency', 'min_amount', 'max_amount', 'class')}
+    node_offset, node_tag_offset, node_tag, loot_offset = [0], [0], [], [0]
+    for v in locations.values():
+        loc_cols['name'].append(strings(v.get("name", "")))
+        loc_cols['id'].append(v.get("locID", 0))
+        loc_cols['action'].append(strings(v['actionType']))
+        loc_cols['duration'].append(v.get("baseDuration", 0))
+        loc_cols['level'].append(_required_level(v))
+        node_list = v.get("nodes", [{"nodeID": "",
+                                     "frequency": 1,
+                                     "minimumBaseAmount": 1,
+                                     "loot": v.get("loot", [])}])
+        for node in node_list:
+            node_frequency = node.get("frequency", 1)
+            node_min_base = node.get("minimumBaseAmount", 1)
+            node_cols['id'].append(strings(node["nodeID"]))
+            node_cols['frequency'].append(node_frequency)
+            node_cols['max_frequency'].append(node.get("maxFrequency", node_frequency))
+            node_cols['min_base'].append(node_min_base)
+            node_cols['max_base'].append(node.get("maximumBaseAmount", node_min_base))
+            node_tag.extend(strings(t) for t in node.get("tags", []))
+            node_tag_offset.append(len(node_tag))
+            for loot in node["loot"]:
+                loot_freq = loot.get("frequency", 1)
+                loot_min_amount = loot.get("minAmount", 1)
+                loot_cols['id'].append(loot.get("id", 0))
+                loot_cols['frequency'].append(loot_freq)
+                loot_cols['max_frequency'].append(loot.get("maxFrequency", loot_freq))
+                loot_cols['min_amount'].append(loot_min_amount)
+                loot_cols['max_amount'].append(loot.get("maxAmount", loot_min_amount))
+                loot_cols['class'].append(strings(items[str(loot.get("id", 0))].get("class", "")))
+            loot_offset.append(len(loot_cols['id']))
+        node_offset.append(len(node_cols['id']))
+    for (prefix, cols) in (('location', loc_cols), ('node', node_cols), ('loot', loot_cols)):
+        for (k, v) in cols.items():
+            dtype = np.int32 if k in ('name', 'action', 'class') or (prefix == 'node' and k == 'id') else np.float64
+            columns[f'{prefix}_{k}'] = np.array(v, dtype=dtype)
+    columns['location_node_offset'] = np.array(node_offset, dtype=np.int64)
+    columns['node_tag_offset'] = np.array(node_tag_offset, dtype=np.int64)
+    columns['node_tag'] = np.array(node_tag, dtype=np.int32)
+    columns['node_loot_offset'] = np.array(loot_offset, dtype=np.int64)
+    columns['string_data'], columns['string_offset'] = strings.arrays()
+
+    header = {
+        'version': BUNDLE_VERSION,
+        'sources': {'items': file_hash(item_file), 'locations': file_hash(location_file)},
+        'arrays': dict(),
+    }
+    # Lay the arrays out on aligned offsets; the header size is fixed before the offsets are known
+    header_size = _ALIGN * 256
+    offset = len(_MAGIC) + 8 + header_size
+    for (k, v) in columns.items():
+        offset = -(-offset // _ALIGN) * _ALIGN
+        header['arrays'][k] = {'dtype': v.dtype.str, 'shape': list(v.shape), 'offset': offset}
+        offset += v.nbytes
+    encoded_header = json.dumps(header).encode('utf-8')
+    if len(encoded_header) > header_size:
+        raise ValueError(f'Bundle header does not fit in {header_size} bytes')
+    with open(output, 'wb') as ff:
+        ff.write(_MAGIC)
+        ff.write(np.uint64(len(encoded_header)).tobytes())
+        ff.write(encoded_header.ljust(header_size, b' '))
+        for (k, v) in columns.items():
+            ff.seek(header['arrays'][k]['offset'])
+            ff.write(np.ascontiguousarray(v).tobytes())
+    return output
+
+
+def load_bundle(path, item_file=None, location_file=None):
+    """
+    Memory-map a bundle. When the source JSON files are given their hashes must match
+    the ones the bundle was compiled from.
+    """
+    return DataBundle(path, item_file=item_file, location_file=location_file)
+
+
+class DataBundle:
+    """
+    Memory-mapped game data bundle. Attribute access returns zero-copy array views.
+    """
+
+    def __init__(self, path, item_file=None, location_file=None):
+        self.path = path
+        self._memmap = np.memmap(path, dtype=np.uint8, mode='r')
+        # Plain ndarray views of the map skip the per-access overhead of the memmap subclass
+        self._raw = self._memmap.view(np.ndarray)
+        if bytes(self._raw[:len(_MAGIC)]) != _MAGIC:
+            raise BundleVersionError(f'{path} is not a game data bundle')
+        header_length = int(self._raw[len(_MAGIC):len(_MAGIC) + 8].view(np.uint64)[0])
+        start = len(_MAGIC) + 8
+        self.header = json.loads(bytes(self._raw[start:start + header_length]).decode('utf-8'))
+        if self.header['version'] != BUNDLE_VERSION:
+            raise BundleVersionError(f'{path} has bundle version {self.header["version"]}, expected {BUNDLE_VERSION}')
+        for (source, source_file) in (('items', item_file), ('locations', location_file)):
+            if source_file is not None and file_hash(source_file) != self.header['sources'][source]:
+                raise BundleVersionError(f'{path} is out of date with {source_file}, rebuild it')
+        self._arrays = dict()
+        for (k, spec) in self.header['arrays'].items():
+            dtype = np.dtype(spec['dtype'])
+            count = int(np.prod(spec['shape'], dtype=np.int64))
+            view = self._raw[spec['offset']:spec['offset'] + count * dtype.itemsize].view(dtype)
+            self._arrays[k] = view.reshape(spec['shape'])
+
+    def __getattr__(self, name):
+        arrays = self.__dict__.get('_arrays', dict())
+        if name in arrays:
+            return arrays[name]
+        raise AttributeError(name)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    @property
+    def version(self):
+        return self.header['sources']
+
+    @property
+    def strings(self):
+        if '_strings' not in self.__dict__:
+            blob = self.string_data.tobytes()
+            offsets = self.string_offset.tolist()
+            self._strings = [blob[a:b].decode('utf-8') for (a, b) in zip(offsets[:-1], offsets[1:])]
+        return self._strings
+
+    def string(self, index):
+        return self.strings[index]
+
+    def items(self):
+        return BundleItems(self)
+
+    def item_names(self):
+        strings = self.strings
+        return {strings[n]: str(i) for (i, n) in zip(self.item_id.tolist(), self.item_name.tolist())}
+
+    def action_locations(self, action_type):
+        from .gathering import Location, Node, NodeLoot
+        results = dict()
+        strings = self.strings
+        action_ids = {strings[i]: i for i in np.unique(self.location_action).tolist()}
+        if action_type not in action_ids:
+            return results
+        # Python lists of the columns: element access on lists is much cheaper than on arrays
+        loc_name, loc_id, loc_duration, loc_level, node_offset = (
+            self.location_name.tolist(), self.location_id.tolist(), self.location_duration.tolist(),
+            self.location_level.tolist(), self.location_node_offset.tolist())
+        node_id, node_frequency, node_max_frequency, node_min_base, node_max_base = (
+            self.node_id.tolist(), self.node_frequency.tolist(), self.node_max_frequency.tolist(),
+            self.node_min_base.tolist(), self.node_max_base.tolist())
+        node_tag, node_tag_offset, loot_offset = (
+            self.node_tag.tolist(), self.node_tag_offset.tolist(), self.node_loot_offset.tolist())
+        loot_id, loot_frequency, loot_max_frequency, loot_min_amount, loot_max_amount, loot_class = (
+            self.loot_id.tolist(), self.loot_frequency.tolist(), self.loot_max_frequency.tolist(),
+            self.loot_min_amount.tolist(), self.loot_max_amount.tolist(), self.loot_class.tolist())
+        for loc in np.flatnonzero(self.location_action == action_ids[action_type]).tolist():
+            this_location = Location(strings[loc_name[loc]], _scalar(loc_id[loc]), action_type,
+                                     _scalar(loc_duration[loc]), _scalar(loc_level[loc]))
+            for node in range(node_offset[loc], node_offset[loc + 1]):
+                tags = [strings[t] for t in node_tag[node_tag_offset[node]:node_tag_offset[node + 1]]]
+                this_node = Node(strings[node_id[node]], _scalar(node_frequency[node]),
+                                 _scalar(node_max_frequency[node]), _scalar(node_min_base[node]),
+                                 _scalar(node_max_base[node]), tags)
+                for loot in range(loot_offset[node], loot_offset[node + 1]):
+                    this_loot = NodeLoot(int(loot_id[loot]), _scalar(loot_frequency[loot]),
+                                         _scalar(loot_max_frequency[loot]), _scalar(loot_min_amount[loot]),
+                                         _scalar(loot_max_amount[loot]), strings[loot_class[loot]])
+                    this_node.loot[this_loot.id] = this_loot
+                this_location.nodes[this_node.node_id] = this_node
+            results[this_location.name] = this_location
+        return results
+
+
+class BundleItems(Mapping):
+    """
+    Read-only item mapping (same keys and records as select_items) that decodes each
+    item record from the bundle on first access.
+    """
+
+    def __init__(self, bundle):
+        self.bundle = bundle
+        self._keys = {str(k): i for (i, k) in enumerate(bundle.item_id.tolist())}
+        self._decoded = dict()
+
+    def __getitem__(self, key):
+        key = str(key)
+        if key not in self._decoded:
+            index = self._keys[key]
+            start, stop = self.bundle.item_record_offset[index:index + 2].tolist()
+            record = json.loads(self.bundle.item_record[start:stop].tobytes())
+            record['name'] = record['name'].replace("'", "")
+            self._decoded[key] = record
+        return self._decoded[key]
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, key):
+        return str(key) in self._keys
+
+
+def is_bundle(source):
+    return isinstance(source, DataBundle) or (isinstance(source, str) and source.endswith(BUNDLE_EXTENSION))
+
+
+def as_bundle(source):
+    return source if isinstance(source, DataBundle) else load_bundle(source)
+
+
+def _scalar(value):
+    return int(value) if value.is_integer() else value
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Compile the game data JSON into a binary bundle')
+    parser.add_argument('item_file', nargs='?', default='data/items.json')
+    parser.add_argument('location_file', nargs='?', default='data/locations.json')
+    parser.add_argument('-o', '--output', default=os.path.join('data', 'gamedata' + BUNDLE_EXTENSION))
+    options = parser.parse_args(args)
+    compile_bundle(options.item_file, options.location_file, options.output)
+    print(f'Wrote {options.output} ({os.path.getsize(options.output)} bytes)')
+
+
+if __name__ == '__main__':
+    main()
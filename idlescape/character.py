@@ -1,14 +1,20 @@
 import json
+from copy import copy
+from .gamedata import GameData
 
 
 class Character:
     """
     Character stats and bonuses for fishing, foraging, and mining.
+    Item data comes from a shared GameData (`game_data`), or is loaded once per process from `datafile`.
     """
 
     def __init__(self, **kwargs):
-        self.item_data = select_items(kwargs.get("datafile", "data/items.json"))
-        self.item_lookup_table = {v['name']:k for (k, v) in self.item_data.items()}
+        self.game_data = kwargs.get("game_data", None)
+        if self.game_data is None:
+            self.game_data = GameData.load(item_file=kwargs.get("datafile", "data/items.json"))
+        self.item_data = self.game_data.items
+        self.item_lookup_table = self.game_data.item_lookup_table
         self.equipment_set = kwargs.get("equipment_set", None)
         # Fishing
         self.fishing_level = kwargs.get("fishing_level", 1)
@@ -37,6 +43,8 @@ class Character:
         self.enchantments = kwargs.get("enchantments", dict())
 
     def assign_equipment(self, eq_set):
+        if eq_set is not None and eq_set.game_data is None and eq_set.item_data is self.item_data:
+            eq_set.game_data = self.game_data
         self.equipment_set = eq_set
         self._update_stats()
 
@@ -60,70 +68,17 @@ class Character:
         if self.equipment_set is None:
             return
         self._reset_stats()
-        mining_set_count = 0
-        foraging_set_count = 0
-        fishing_set_count = 0
-        for item_slot in self.equipment_set.slots:
-            component = self.equipment_set.equipment_component(item_slot)
-            actual_item = self.get_item_by_name(component.name)
-            if actual_item is None:
-                continue
-            augment_level = component.augment
-            equipment_stats = actual_item.get('equipmentStats', dict())
-            tool_boost = equipment_stats.get('toolBoost', [])
-            aug_bonus = equipment_stats.get('augmentationBonus', [])
-            item_set = equipment_stats.get('itemSet', [])
-            for tb in tool_boost:
-                if tb['skill'] == 'mining':
-                    self.mining_bonus += tb['boost']
-                if tb['skill'] == 'foraging':
-                    self.foraging_bonus += tb['boost']
-                if tb['skill'] == 'fishing':
-                    self.fishing_bonus += tb['boost']
-                if tb['skill'] == 'fishingBaitPower':
-                    self.bait_power += tb['boost']
-                if tb['skill'] == 'fishingReelPower':
-                    self.reel_power += tb['boost']
-                if tb['skill'] == 'fishingRarityPower':
-                    self.bonus_rarity += tb['boost']
-            for ab in aug_bonus:
-                if ab['stat'] == 'toolBoost.mining':
-                    self.mining_bonus += ab['value'] * augment_level
-                if ab['stat'] == 'toolBoost.foraging':
-                    self.foraging_bonus += ab['value'] * augment_level
-                if ab['stat'] == 'toolBoost.fishing':
-                    self.fishing_bonus += ab['value'] * augment_level
-                if ab['stat'] == 'toolBoost.fishingBaitPower':
-                    self.bait_power += ab['value'] * augment_level
-                if ab['stat'] == 'toolBoost.fishingReelPower':
-                    self.reel_power += ab['value'] * augment_level
-                if ab['stat'] == 'toolBoost.fishingRarityPower':
-                    self.bonus_rarity += ab['value'] * augment_level
-            # Check bait
-            fishing_bait = actual_item.get('fishingBait', {})
-            self.bait_fishing_bonus = fishing_bait.get('level', 0)
-            self.bait_bait_power = fishing_bait.get('bait', 0)
-            self.bait_reel_power = fishing_bait.get('reel', 0)
-            self.bait_bonus_rarity = fishing_bait.get('bonus', 0)
-            if 10007 in item_set:
-                mining_set_count += 1
-            if 10005 in item_set:
-                foraging_set_count += 1
-            if 10001 in item_set:
-                fishing_set_count += 1
-        if mining_set_count == 3:
-            self.mining_set_bonus = 0.2
-        if mining_set_count == 4:
-            self.mining_set_bonus = 0.4
-        if foraging_set_count == 3:
-            self.foraging_set_bonus = 0.2
-        if foraging_set_count == 4:
-            self.foraging_set_bonus = 0.4
-        if fishing_set_count == 3:
-            self.fishing_set_bonus = 0.2
-        if fishing_set_count == 4:
-            self.fishing_set_bonus = 0.4
+        for (k, v) in self.game_data.item_stats.loadout_stats(self.equipment_set).items():
+            setattr(self, k, v)
 
+    def snapshot(self):
+        """
+        Copy-on-write copy for simulations: shares the read-only game data, item tables and
+        equipment set, and owns its stat fields and enchantments.
+        """
+        clone = copy(self)
+        clone.enchantments = dict(self.enchantments)
+        return clone
 
     def get_item_by_name(self, name):
         index = self.item_lookup_table.get(name, None)
@@ -139,6 +94,7 @@ class EquipmentSet:
     """
 
     def __init__(self, item_data, **kwargs):
+        self.game_data = kwargs.get("game_data", None)
         self.slots = ['helm', 'body', 'legs', 'shield', 'weapon', 'boots', 'gloves', 'cape', 'arrows',
                       'ring', 'necklace', 'pickaxe', 'hatchet', 'hoe', 'tongs', 'tome', 'tacklebox', 'bait']
         for slot in self.slots:
@@ -147,29 +103,66 @@ class EquipmentSet:
         self.item_data = item_data
 
     def matching_items(self, slot, **kwargs):
-        flip = kwargs.get("flip", False)
-        related_skill = kwargs.get("related_skill", None)
-        ret_dict = dict()
-        if slot == 'bait':
-            for (k, v) in self.item_data.items():
-                if v.get('fishingBait', None) is not None:
-                    ret_dict[k] = v.get("name", '')
-        for (k, v) in self.item_data.items():
+        """
+        {id: name} ({name: id} with flip) of the items that fit a slot, optionally restricted to a
+        related_skill, a min_level/max_level range of required level or augmentable items
+        """
+        if self.game_data is None:
+            self.game_data = GameData.for_items(self.item_data)
+        index = self.game_data.equipment_index if self.game_data is not None else EquipmentIndex(self.item_data)
+        return index.matching_items(slot, **kwargs)
+
+    def equipment_component(self, slot, **kwargs):
+        return EquipmentComponent(string=f"{getattr(self,slot)}_{getattr(self,slot+'_augment')}")
+
+
+class EquipmentIndex:
+    """
+    Items of every slot, built in one pass over the item data: equipment by (slot, relatedSkill),
+    plus the fishing bait items that also fit the bait slot. Entries keep the item data order.
+    """
+
+    def __init__(self, item_data):
+        self.bait = []
+        self.by_slot = dict()
+        self.by_slot_skill = dict()
+        for (k, v) in item_data.items():
+            required_level = max(v.get("requiredLevel", dict()).values(), default=0)
+            entry = (k, v.get("name", ''), required_level, "augmentationCost" in v)
+            if v.get('fishingBait', None) is not None:
+                self.bait.append(entry)
             if v.get("class", "") != 'equipment':
                 continue
-            if v.get("equipmentStats", dict()).get("slot", "") != slot:
-                continue
-            if related_skill is not None:
-                if v.get("relatedSkill", "") != related_skill:
-                    continue
-            ret_dict[k] = v.get("name", '')
+            slot = v.get("equipmentStats", dict()).get("slot", "")
+            self.by_slot.setdefault(slot, []).append(entry)
+            self.by_slot_skill.setdefault((slot, v.get("relatedSkill", "")), []).append(entry)
+
+    def entries(self, slot, related_skill=None):
+        """
+        (id, name, required level, augmentable) of the items fitting a slot
+        """
+        ret = self.bait if slot == 'bait' else []
+        if related_skill is None:
+            return ret + self.by_slot.get(slot, [])
+        return ret + self.by_slot_skill.get((slot, related_skill), [])
+
+    def matching_items(self, slot, **kwargs):
+        flip = kwargs.get("flip", False)
+        min_level = kwargs.get("min_level", None)
+        max_level = kwargs.get("max_level", None)
+        augmentable = kwargs.get("augmentable", False)
+        entries = self.entries(slot, kwargs.get("related_skill", None))
+        if min_level is not None:
+            entries = [e for e in entries if e[2] >= min_level]
+        if max_level is not None:
+            entries = [e for e in entries if e[2] <= max_level]
+        if augmentable:
+            entries = [e for e in entries if e[3]]
+        ret_dict = {k: name for (k, name, level, aug) in entries}
         if flip:
             ret_dict = {v: k for (k, v) in ret_dict.items()}
         return ret_dict
 
-    def equipment_component(self, slot, **kwargs):
-        return EquipmentComponent(string=f"{getattr(self,slot)}_{getattr(self,slot+'_augment')}")
-
 
 class EquipmentComponent:
     def __init__(self, **kwargs):
@@ -189,6 +182,9 @@ class EquipmentComponent:
         self.augment = int(split_string[1])
 
 def select_items(data_file):
+    from .bundle import is_bundle, as_bundle
+    if is_bundle(data_file):
+        return as_bundle(data_file).items()
     with open(data_file) as jj:
         data = json.load(jj)
         for (k, v) in data.items():
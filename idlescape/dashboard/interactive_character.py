@@ -3,6 +3,7 @@ from ..character import Character, EquipmentSet
 from ..foraging import Foraging
 from ..mining import Mining
 from ..fishing import Fishing
+from ..gamedata import GameData
 import json
 
 
@@ -16,17 +17,22 @@ class InteractiveCharacter:
         # Hacky Hack
         # Player Stats and Levels
         self.player_stats = json.loads(pn.state.cookies.get("interactive_character", "{}").replace("'", "\""))
-        self.player = Character(datafile=item_file, **self.player_stats)
-        self.mining = Mining(self.player, location_file)
-        self.foraging = Foraging(self.player, location_file)
-        self.fishing = Fishing(self.player, location_file)
+        self.game_data = GameData.load(item_file=item_file, location_file=location_file)
+        self.player = Character(game_data=self.game_data, **self.player_stats)
+        self.mining = Mining(self.player, self.game_data)
+        self.foraging = Foraging(self.player, self.game_data)
+        # Seeded so the numbers do not flicker between redraws and gear changes are compared on the same draws
+        self.fishing = Fishing(self.player, self.game_data, seed=0)
         # Player equipment sets (one for each action)
         self.player_mining_equipment = json.loads(pn.state.cookies.get("mining_equipment", "{}").replace("'", "\""))
         self.player_foraging_equipment = json.loads(pn.state.cookies.get("foraging_equipment", "{}").replace("'", "\""))
         self.player_fishing_equipment = json.loads(pn.state.cookies.get("fishing_equipment", "{}").replace("'", "\""))
-        self.mining_gear = EquipmentSet(self.player.item_data, **self.player_mining_equipment)
-        self.foraging_gear = EquipmentSet(self.player.item_data, **self.player_foraging_equipment)
-        self.fishing_gear = EquipmentSet(self.player.item_data, **self.player_fishing_equipment)
+        self.mining_gear = EquipmentSet(self.player.item_data, game_data=self.game_data,
+                                        **self.player_mining_equipment)
+        self.foraging_gear = EquipmentSet(self.player.item_data, game_data=self.game_data,
+                                          **self.player_foraging_equipment)
+        self.fishing_gear = EquipmentSet(self.player.item_data, game_data=self.game_data,
+                                         **self.player_fishing_equipment)
 
     def _apply_connectors_(self):
         pass
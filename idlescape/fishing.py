@@ -1,30 +1,41 @@
 from .gathering import *
 from .character import *
+from .gamedata import GameData
+from collections import OrderedDict
+from functools import lru_cache
+from statistics import NormalDist
 import numpy as np
 
 
 class Fishing(Gathering):
     player = None
-
-    def __init__(self, character, location_data, **kwargs):
+    action_type = "Action-Fishing"
+    fingerprint_attributes = ('fishing_level', 'fishing_bonus', 'fishing_set_bonus', 'bait_fishing_bonus',
+                              'bait_power', 'bait_bait_power', 'reel_power', 'bait_reel_power', 'bonus_rarity',
+                              'bait_bonus_rarity')
+    fingerprint_enchantments = Gathering.fingerprint_enchantments + (
+        'deadliestCatch', 'pungentBait', 'fishingMagnetism', 'reinforcedLine', 'fishing', 'fiberFinder')
+    # Rarity and effective level shift the node and loot mix and can lower experience rates
+    gear_nonmonotone_stats = ('fishing_bonus', 'bait_fishing_bonus', 'bonus_rarity', 'bait_bonus_rarity')
+
+    def __init__(self, character, location_data=None, **kwargs):
         self.player = character
         self.items = self.player.item_data
-        self.locations = select_action_locations(location_data, self.items, "Action-Fishing")
+        self.game_data = GameData.resolve(location_data, self.player.game_data)
+        self.locations = self.game_data.action_locations(self.action_type)
         self.use_castnet = kwargs.get("castnet", False)
         self.use_driftwood = kwargs.get("driftwood", False)
+        self.use_exact = kwargs.get("exact", False)
         self.accuracy = kwargs.get("accuracy", 10000)
-        if self.use_castnet:
-            from tensorflow import keras
-            from .litemodel import LiteModel
-            tf_castnet_trials = keras.models.load_model('Castnet_Trials')
-            tf_castnet_resources = keras.models.load_model('Castnet_CalcResource')
-            self.castnet_average_tries_to_finish_node = LiteModel.from_keras_model(tf_castnet_trials)
-            self.castnet_calculate_node_resources = LiteModel.from_keras_model(tf_castnet_resources)
-        if self.use_driftwood:
-            import joblib
-            self.driftwood_average_tries_to_finish_node = joblib.load('AvgTrials.pkl')
-            self.driftwood_calculate_node_resources = joblib.load('CalcResources.pkl')
+        self.confidence = kwargs.get("confidence", 0.95)
+        self.backend = self._select_backend(**kwargs)
+        if kwargs.get("kernel_cache", None) is not None:
+            from .fishing_backends import with_kernel_cache
+            self.backend = with_kernel_cache(self.backend, kwargs["kernel_cache"], self.game_data)
+        self._backend_cache = None
         self.alt_experience = kwargs.get("alt_experience", None)
+        self.cache_size = kwargs.get("cache_size", 256)
+        self.cache_clear()
         # Fishing gear
 
     # Fishing specific attributes
@@ -32,12 +43,33 @@ class Fishing(Gathering):
         # Enchantments, gear
         pass
 
+    def _select_backend(self, **kwargs):
+        """
+        Node size / tries backend: an explicit `backend` (name or FishingBackend), the fastest one within
+        `tolerance`, or the one named by the castnet/driftwood/exact flags (Monte Carlo by default)
+        """
+        from . import fishing_backends
+        backend = kwargs.get("backend", None)
+        if backend is None and kwargs.get("tolerance", None) is not None:
+            return fishing_backends.select_backend(kwargs["tolerance"])
+        if backend is None:
+            if self.use_castnet:
+                backend = 'castnet'
+            elif self.use_driftwood:
+                backend = 'driftwood'
+            elif self.use_exact:
+                backend = 'exact'
+            else:
+                backend = 'montecarlo'
+        if isinstance(backend, str):
+            return fishing_backends.make_backend(backend, **kwargs)
+        return backend
+
     def get_action_primary_attribute(self):
         return 'fishing_level'
 
     def get_maximum_experience(self):
-        zone_xp_list = [self.zone_experience_rate(loc.name) for (k, loc) in self.locations.items()]
-        return max(zone_xp_list)
+        return max(self.experience_rates().tolist())
 
     def _effective_level(self):
         set_bonus = 1 + self.player.fishing_set_bonus
@@ -98,12 +130,42 @@ class Fishing(Gathering):
         total_frequency = sum([v for (k, v) in boosted_frequency_dict.items()])
         return {k: v / total_frequency for (k, v) in boosted_frequency_dict.items()}
 
+    def _node_rate_array(self, table):
+        frequency = (table.node_frequency + self._bonus_rarity()) * (1 + self._effective_level() / 360)
+        return table.location_share(np.maximum(0, np.minimum(frequency, table.node_max_frequency)))
+
+    def _loot_rate_array(self, table):
+        frequency = (table.loot_frequency + self._bonus_rarity()) * (1 + self._effective_level() / 360)
+        frequency = np.minimum(frequency, table.loot_max_frequency)
+        fiber = 1 + self.player.enchantments.get('fiberFinder', 0) * 0.25
+        frequency = np.where(table.loot_class == "fiber", frequency * fiber, frequency)
+        return table.node_share(np.maximum(0, frequency))
+
     def _node_base_chance(self, location):
         fishing_enchant = self.player.enchantments.get("fishing", 0)  # TODO, add to player.enchantments
         # Changed bait_power from 420 to 200, 0.2 to 0.3
         return 0.4 + (self._effective_level() - location.level * 1.25) / 275 + (fishing_enchant * 0.025) + (
                 self._bait_power() / 200)
 
+    def _node_base_chance_array(self, table):
+        fishing_enchant = self.player.enchantments.get("fishing", 0)
+        return 0.4 + (self._effective_level() - table.level * 1.25) / 275 + (fishing_enchant * 0.025) + (
+                self._bait_power() / 200)
+
+    def _tries_to_find_node_array(self, table):
+        """
+        _average_tries_to_find_node of every location (of every character of a batch)
+        """
+        average_tries = 0
+        chance_to_reach_this_attempt = 1
+        base_chance = self._node_base_chance_array(table)
+        fishing_enchant = self.player.enchantments.get('fishing', 0)
+        for nodeFindFailures in range(7):
+            chance_this_attempt = np.minimum(1, base_chance + fishing_enchant * 0.025 + nodeFindFailures / 6)
+            average_tries = average_tries + chance_this_attempt * chance_to_reach_this_attempt * (nodeFindFailures + 1)
+            chance_to_reach_this_attempt = chance_to_reach_this_attempt * (1 - chance_this_attempt)
+        return average_tries
+
     def _average_tries_to_find_node(self, location):
         average_tries = 0
         chance_to_reach_this_attempt = 1
@@ -117,24 +179,39 @@ class Fishing(Gathering):
         return average_tries
 
     def _average_node_size(self, location, node):
-        nodes = self.accuracy
-        return self._calculate_node_resources(node, location, trials=nodes)
-
-    def _calculate_node_resources(self, node, location, **kwargs):
-        zone_level = location.level
-        min_base = node.minimum_base_amount
-        max_base = node.maximum_base_amount
-        trials = kwargs.get('trials', 1)
-        if self.use_castnet:
-            return self.castnet_calculate_node_resources.predict_single(
-                [zone_level, min_base, max_base, self._effective_level(), self._bait_power()])[0]
-        elif self.use_driftwood:
-            return self.driftwood_calculate_node_resources.predict(
-                [[zone_level, min_base, max_base, self._effective_level(), self._bait_power()]])[0]
-        else:
-            return _calculate_node_resources_jit_fishing(zone_level, min_base, max_base, self._effective_level(),
-                                                         self._bait_power(),
-                                                         trials)
+        # The backend decides the sample count (accuracy is passed to it in _select_backend)
+        return self._backend_batch(location)[node.node_id][0]
+
+    def _backend_batch(self, location):
+        """
+        Backend node sizes and tries for the nodes of a location, cached until the player inputs
+        change. Backends with batch_locations get every location in one call.
+        """
+        fishing_level = self.player.fishing_level + self.player.fishing_bonus
+        fishing_enchant = self.player.enchantments.get('fishing', 0)
+        key = (self._effective_level(), self._bait_power(), fishing_level, self.player.bait_power, fishing_enchant)
+        if self._backend_cache is None or self._backend_cache[0] != key:
+            self._backend_cache = (key, dict())
+        predictions = self._backend_cache[1]
+        if location.name not in predictions:
+            locations = self.locations.values() if self.backend.batch_locations else [location]
+            nodes = [(loc, node) for loc in locations for node in loc.nodes.values()]
+            resources_input = np.array([[loc.level, node.minimum_base_amount, node.maximum_base_amount,
+                                         key[0], key[1]] for (loc, node) in nodes]).reshape(-1, 5)
+            tries_input = np.array([[self._node_base_chance(loc), loc.level, node.minimum_base_amount,
+                                     node.maximum_base_amount, fishing_level, self.player.bait_power, fishing_enchant]
+                                    for (loc, node) in nodes]).reshape(-1, 7)
+            estimates = self.backend.estimate(resources_input, tries_input)
+            for ((loc, node), *estimate) in zip(nodes, *estimates):
+                # (size, tries, size standard error, tries standard error)
+                predictions.setdefault(loc.name, dict())[node.node_id] = tuple(estimate[i] for i in (0, 2, 1, 3))
+        return predictions[location.name]
+
+    def _node_errors(self, location):
+        """
+        Standard errors of the node (sizes, tries) estimates, zero for deterministic backends
+        """
+        return {k: v[2:] for (k, v) in self._backend_batch(location).items()}
 
     def _node_sizes(self, location):
         return {k: self._average_node_size(location, v) for (k, v) in location.nodes.items()}
@@ -142,37 +219,102 @@ class Fishing(Gathering):
     def _node_actions(self, location):
         return {k: self._average_tries_to_finish_node(location, v) for (k, v) in location.nodes.items()}
 
-    def _average_tries_to_finish_node(self, location, node, **kwargs):
-        zone_level = location.level
-        min_base = node.minimum_base_amount
-        max_base = node.maximum_base_amount
-        fishing_level = self.player.fishing_level + self.player.fishing_bonus
-        bait_power = self.player.bait_power
-        base_chance = self._node_base_chance(location)
-        fishing_enchant = self.player.enchantments.get('fishing', 0)
-        if self.use_castnet:
-            return \
-                self.castnet_average_tries_to_finish_node.predict_single([base_chance, zone_level, min_base, max_base,
-                                                                          fishing_level, bait_power, fishing_enchant])[
-                    0]
-        elif self.use_driftwood:
-            return self.driftwood_average_tries_to_finish_node.predict([[base_chance, zone_level, min_base, max_base,
-                                                                         fishing_level, bait_power, fishing_enchant]])[
-                0]
-        else:
-            return _average_tries_to_finish_node_jit_fishing(base_chance, zone_level, min_base, max_base, fishing_level,
-                                                             bait_power, fishing_enchant, self.accuracy)
+    def _average_tries_to_finish_node(self, location, node):
+        return self._backend_batch(location)[node.node_id][1]
 
-    def zone_experience_rate(self, location_name):
+    def _node_estimate_array(self, table, index, unlocked_only=False):
         """
-        Experience per hour
+        Backend node sizes (index 0) or tries (index 1) of every node; with unlocked_only the zones
+        above the player's level are never sent to the backend and get 0
         """
-        location = self.get_location_by_name(location_name)
-        if location.level > self.player.fishing_level:
-            return 0
-        if self.alt_experience is not None:
-            return self.alt_experience.get(location_name, 0) * self.zone_action_rate(location_name)
+        locations = [self.locations[name] for name in table.names]
+        return np.array([0 if unlocked_only and locations[i].level > self.player.fishing_level
+                         else self._backend_batch(locations[i])[node_id][index]
+                         for (i, node_id) in zip(table.node_location.tolist(), table.node_ids)], dtype=float)
+
+    def _node_size_array(self, table):
+        return self._node_estimate_array(table, 0)
 
+    def _node_action_array(self, table, node_sizes):
+        return self._node_estimate_array(table, 1)
+
+    def _node_time_array(self, table, node_actions):
+        haste = self.player.enchantments.get('haste', 0)
+        base_time = table.base_duration / 1000 / (1 + haste * 0.04)
+        node_search_time = np.maximum(1, base_time * 1.75 * (1 - (self._bait_power() / 400)))
+        a_find = self._tries_to_find_node_array(table)
+        loot_search_time = np.maximum(1, base_time / 1.25 * (200 / (self._reel_power() + 200)))
+        return (node_search_time * a_find)[..., table.node_location] \
+            + loot_search_time[..., table.node_location] * node_actions
+
+    def _action_rate_array(self, table, node_rates, node_sizes, node_actions):
+        total_time = table.location_sum(self._node_time_array(table, node_actions) * node_rates)
+        action_rate = table.location_sum(node_sizes * node_rates) / total_time * 3600
+        return np.where(table.level > self.player.fishing_level, 0.0, action_rate)
+
+    def _experience_rates(self):
+        table = self.location_table()
+        # Locked zones are zero anyway, as in zone_experience_rate
+        node_sizes = self._node_estimate_array(table, 0, unlocked_only=True)
+        node_actions = self._node_estimate_array(table, 1, unlocked_only=True)
+        return self._experience_rate_array(table, node_sizes, node_actions)
+
+    def _experience_rate_array(self, table, node_sizes, node_actions):
+        node_rates = self._node_rate_array(table)
+        if self.alt_experience is not None:
+            experience = np.array([self.alt_experience.get(name, 0) for name in table.names], dtype=float)
+            return experience * self._action_rate_array(table, node_rates, node_sizes, node_actions)
+        loot_experience = self._loot_rate_array(table) * self.game_data.experience_vector(table.loot_item.tolist(), 30)
+        total_experience = table.location_sum(table.node_sum(loot_experience) * node_rates * node_sizes)
+        total_time = table.location_sum(self._node_time_array(table, node_actions) * node_rates)
+        return np.where(table.level > self.player.fishing_level, 0.0, total_experience / total_time * 3600)
+
+    def batch_rates(self, batch):
+        """
+        Experience and action rates (per hour) of every character of a CharacterBatch at every zone
+        of location_table(). Characters with the same fishing inputs are evaluated once, and the
+        backend gets the distinct node inputs of all of them in a single call.
+        """
+        table = self.location_table()
+        (first, inverse) = batch.unique(self.fingerprint_attributes, self.fingerprint_enchantments)
+        action = copy(self)
+        action.player = batch.subset(first).columns()
+        (node_sizes, node_actions) = action._batch_node_estimates(table)
+        node_rates = action._node_rate_array(table)
+        action_rate = action._action_rate_array(table, node_rates, node_sizes, node_actions)
+        experience_rate = action._experience_rate_array(table, node_sizes, node_actions)
+        return BatchEvaluation(tuple(table.names), experience_rate[inverse], action_rate[inverse])
+
+    def _batch_node_estimates(self, table):
+        """
+        Backend (sizes, tries) of every node for every character of a batch, as (n_characters, n_nodes)
+        arrays: one backend call on the distinct kernel inputs (the inputs of _backend_batch) of the
+        zones each character can use
+        """
+        level = table.level[table.node_location]
+        fishing_level = self.player.fishing_level + self.player.fishing_bonus
+        fishing_enchant = self.player.enchantments.get('fishing', 0)
+        base_chance = self._node_base_chance_array(table)[..., table.node_location]
+        resources_input = np.broadcast_arrays(level, table.node_min_base, table.node_max_base,
+                                              self._effective_level(), self._bait_power())
+        tries_input = np.broadcast_arrays(base_chance, level, table.node_min_base, table.node_max_base,
+                                          fishing_level, self.player.bait_power, fishing_enchant)
+        shape = np.broadcast_shapes(*(a.shape for a in resources_input + tries_input))
+        rows = np.stack([np.broadcast_to(a, shape) for a in resources_input + tries_input], axis=-1).reshape(-1, 12)
+        # Nodes of zones above a character's level are never evaluated (NaN)
+        unlocked = np.broadcast_to(level <= self.player.fishing_level, shape).reshape(-1)
+        node_sizes = np.full(len(rows), np.nan)
+        node_actions = np.full(len(rows), np.nan)
+        if unlocked.any():
+            (unique_rows, inverse) = np.unique(rows[unlocked], axis=0, return_inverse=True)
+            (sizes, size_errors, tries, tries_errors) = self.backend.estimate(unique_rows[:, :5], unique_rows[:, 5:])
+            inverse = inverse.reshape(-1)
+            node_sizes[unlocked] = np.asarray(sizes)[inverse]
+            node_actions[unlocked] = np.asarray(tries)[inverse]
+        return node_sizes.reshape(shape), node_actions.reshape(shape)
+
+    def _evaluate_zone(self, location_name):
+        location = self.get_location_by_name(location_name)
         node_rates = self._node_rates(location)
         node_sizes = self._node_sizes(location)
         node_actions = self._node_actions(location)
@@ -183,16 +325,66 @@ class Fishing(Gathering):
         a_find = self._average_tries_to_find_node(location)
         loot_search_time = max(1, base_time / 1.25 * (200 / (self._reel_power() + 200)))
 
+        node_errors = self._node_errors(location)
+        node_times = dict()
         total_experience = 0
+        total_actions = 0
         total_time = 0
+        # Delta method variance terms: sum of (d numerator)^2 for actions and experience, (d time)^2
+        actions_variance = 0
+        experience_variance = 0
+        time_variance = 0
         for (name, rate) in node_rates.items():
-            total_time += (node_search_time * a_find + loot_search_time * node_actions[name]) * rate
+            node_times[name] = node_search_time * a_find + loot_search_time * node_actions[name]
+            total_time += node_times[name] * rate
             avg_size = node_sizes[name]
+            total_actions += avg_size * rate
             loot_rates = self._loot_rates(location.nodes[name])
+            node_experience = 0
             for (itemid, loot) in location.nodes[name].loot.items():
                 item_stats = self.player.item_data[str(itemid)]
-                total_experience += loot_rates[itemid] * avg_size * rate * item_stats.get("experience", 30)
-        return total_experience / total_time * 3600
+                node_experience += loot_rates[itemid] * rate * item_stats.get("experience", 30)
+            total_experience += node_experience * avg_size
+            size_error, tries_error = node_errors[name]
+            actions_variance += (rate * size_error) ** 2
+            experience_variance += (node_experience * size_error) ** 2
+            time_variance += (rate * loot_search_time * tries_error) ** 2
+        experience_rate_ci = None
+        action_rate_ci = None
+        if location.level > self.player.fishing_level:
+            action_rate = 0
+            experience_rate = 0
+        else:
+            action_rate = total_actions / total_time * 3600
+            if self.alt_experience is not None:
+                experience_rate = self.alt_experience.get(location_name, 0) * action_rate
+            else:
+                experience_rate = total_experience / total_time * 3600
+            if actions_variance + time_variance > 0:
+                # Sizes and tries of a node share their draws and are positively correlated, which
+                # narrows the ratio; treating them as independent keeps the interval conservative
+                z = NormalDist().inv_cdf((1 + self.confidence) / 2)
+                time_term = time_variance / total_time ** 2
+                action_error = z * action_rate * np.sqrt(actions_variance / total_actions ** 2 + time_term)
+                action_rate_ci = (action_rate - action_error, action_rate + action_error)
+                if self.alt_experience is not None:
+                    experience_error = experience_rate / action_rate * action_error if action_rate > 0 else 0
+                else:
+                    experience_error = z * experience_rate * np.sqrt(
+                        experience_variance / total_experience ** 2 + time_term) if total_experience > 0 else 0
+                experience_rate_ci = (experience_rate - experience_error, experience_rate + experience_error)
+        item_rates = self._item_rates(location, node_rates, node_sizes, node_actions)
+        return ZoneEvaluation(location_name, node_rates, node_sizes, node_actions, node_times, experience_rate,
+                              action_rate, item_rates, experience_rate_ci, action_rate_ci)
+
+    def zone_experience_rate(self, location_name):
+        """
+        Experience per hour
+        """
+        location = self.get_location_by_name(location_name)
+        if location.level > self.player.fishing_level:
+            return 0
+        return self.evaluate_zone(location_name).experience_rate
 
     def zone_action_rate(self, location_name):
         """
@@ -201,33 +393,177 @@ class Fishing(Gathering):
         location = self.get_location_by_name(location_name)
         if location.level > self.player.fishing_level:
             return 0
+        return self.evaluate_zone(location_name).action_rate
 
-        node_rates = self._node_rates(location)
-        node_sizes = self._node_sizes(location)
-        node_actions = self._node_actions(location)
-        haste = self.player.enchantments.get('haste', 0)
 
-        base_time = location.base_duration / 1000 / (1 + haste * 0.04)
-        node_search_time = max(1, base_time * 1.75 * (1 - (self._bait_power() / 400)))
-        a_find = self._average_tries_to_find_node(location)
-        loot_search_time = max(1, base_time / 1.25 * (200 / (self._reel_power() + 200)))
+Gathering.register(Fishing)
 
-        total_actions = 0
-        total_time = 0
-        for (name, rate) in node_rates.items():
-            total_time += (node_search_time * a_find + loot_search_time * node_actions[name]) * rate
-            total_actions += node_sizes[name] * rate
-        return total_actions / total_time * 3600
+# NumPy fishing section: the batched kernels used when numba is unavailable (e.g. Pyodide)
+# Counter based splitmix64 stream: uniform n of a node is a hash of (node key, n), so any range of
+# samples can be drawn independently (one chunk per thread) and the NumPy and numba kernels draw
+# exactly the same numbers. Sample i uses the draws 6i .. 6i+5.
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+_MIX1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX2 = np.uint64(0x94D049BB133111EB)
+_DRAWS = 6
+
+
+def node_key(seed, zone_level, min_base, max_base):
+    """
+    Stream key of a node. With a (non-negative) seed it depends only on the node identity, not on
+    player stats, so two gear sets are compared on the same draws (common random numbers). Without
+    a seed it comes from the global RNG.
+    """
+    if seed is None:
+        return np.uint64(np.random.randint(0, 2 ** 63))
+    entropy = [int(seed), int(zone_level), int(min_base), int(max_base)]
+    return np.random.SeedSequence(entropy).generate_state(1, np.uint64)[0]
+
+
+def _splitmix64_uniforms(key, counters):
+    z = key + (counters + 1) * _GOLDEN
+    z = (z ^ (z >> 30)) * _MIX1
+    z = (z ^ (z >> 27)) * _MIX2
+    z = z ^ (z >> 31)
+    return (z >> 11) * (1.0 / 9007199254740992.0)
+
+
+def node_rolls(seed, zone_level, min_base, max_base, trials, start=0):
+    """
+    The (6, trials) uniforms behind node samples start .. start+trials of a node
+    """
+    key = node_key(seed, zone_level, min_base, max_base)
+    return _node_rolls(key, trials, start)
+
+
+def _node_rolls(key, trials, start=0):
+    counters = np.arange(start * _DRAWS, (start + trials) * _DRAWS, dtype=np.uint64)
+    return _splitmix64_uniforms(key, counters).reshape(trials, _DRAWS).T
+
+
+def _max_node_size(zone_level, min_base, max_base, fishing_level, bait_power):
+    """
+    Upper bound of the sampled node size (sizes the tries table for the kernels)
+    """
+    spread = abs(fishing_level - zone_level)
+    return int(3 * (abs(max_base) + spread / 8 + abs(bait_power) / 20)
+               + 1.5 * (abs(min_base) + spread / 6 + abs(bait_power) / 10)) + 2
+
+
+def _sample_node_sizes_numpy_fishing(zone_level, min_base, max_base, fishing_level, bait_power, trials, rolls=None):
+    """
+    All `trials` node sizes of _calculate_node_resources_jit_fishing drawn at once, from `rolls`
+    (see node_rolls) when given
+    """
+    if rolls is None:
+        rolls = np.random.rand(6, trials)
+    maximum_node_size = np.floor(max_base + (rolls[0] * (fishing_level - zone_level) / 8) + np.floor(
+        rolls[1] * bait_power / 20))
+    minimum_node_size = np.floor(min_base + (rolls[2] * (fishing_level - zone_level) / 6) + np.floor(
+        rolls[3] * bait_power / 10))
+
+    lucky_chance = 0.05 + (bait_power / 2000)
+    lucky_rolls = rolls[4] <= lucky_chance
+    minimum_node_size = minimum_node_size * (1 + 0.5 * lucky_rolls)
+    maximum_node_size = maximum_node_size * (1 + 2.0 * lucky_rolls)
+
+    delta = np.abs(maximum_node_size - minimum_node_size)
+    small = np.minimum(maximum_node_size, minimum_node_size)
+    return np.floor(rolls[5] * delta + small)
+
+
+class TriesTable:
+    """
+    Prefix sums of 1/p(n), the tries needed to take the n-th last resource of a node, for one
+    (base_chance, fishing enchant). cumulative[size] is the average tries to finish a node of
+    that size. Grows on demand; shared across nodes and zones through tries_table().
+    """
+
+    def __init__(self, base_chance, fishing):
+        self.base_chance = base_chance
+        self.fishing = fishing
+        self.cumulative = np.zeros(1)
+
+    def _grow(self, length):
+        n_res = np.arange(len(self.cumulative), length)
+        odds = np.minimum(1.0, self.base_chance + self.fishing * 0.025 + n_res / 48)
+        self.cumulative = np.concatenate([self.cumulative, self.cumulative[-1] + np.cumsum(1 / odds)])
+
+    def lookup(self, sizes):
+        sizes = np.clip(np.asarray(sizes).astype(np.int64), 0, None)
+        largest = int(sizes.max()) if sizes.size > 0 else 0
+        if largest >= len(self.cumulative):
+            self._grow(max(largest + 1, 2 * len(self.cumulative)))
+        return self.cumulative[sizes]
+
+
+_tries_tables = OrderedDict()
+_TRIES_TABLE_LIMIT = 256
+
+
+def tries_table(base_chance, fishing):
+    key = (float(base_chance), float(fishing))
+    table = _tries_tables.get(key, None)
+    if table is None:
+        table = TriesTable(*key)
+        _tries_tables[key] = table
+        if len(_tries_tables) > _TRIES_TABLE_LIMIT:
+            _tries_tables.popitem(last=False)
+    else:
+        _tries_tables.move_to_end(key)
+    return table
+
+
+def _tries_to_finish(sizes, base_chance, fishing):
+    """
+    Tries to exhaust a node of each size: sum of 1/p(n) for n = size..1
+    """
+    return tries_table(base_chance, fishing).lookup(sizes)
+
+
+def _calculate_node_resources_numpy_fishing(zone_level, min_base, max_base, fishing_level, bait_power, trials):
+    return np.mean(_sample_node_sizes_numpy_fishing(zone_level, min_base, max_base, fishing_level, bait_power,
+                                                    trials))
+
+
+def _average_tries_to_finish_node_numpy_fishing(base_chance, zone_level, min_base, max_base, fishing_level, bait_power,
+                                                fishing, trials):
+    node_resources = _sample_node_sizes_numpy_fishing(zone_level, min_base, max_base, fishing_level, bait_power,
+                                                      trials)
+    return np.mean(_tries_to_finish(node_resources, base_chance, fishing))
+
+
+def _node_resources_moments_numpy_fishing(key, zone_level, min_base, max_base, fishing_level, bait_power, trials,
+                                          start, chunk=None):
+    """
+    (sum, sum of squares) of node sizes start .. start+trials of the stream `key`, in one vectorized
+    pass (chunk only applies to the numba kernel)
+    """
+    sizes = _sample_node_sizes_numpy_fishing(zone_level, min_base, max_base, fishing_level, bait_power, trials,
+                                             _node_rolls(key, trials, start))
+    return float(sizes.sum()), float(np.dot(sizes, sizes))
+
+
+def _node_tries_moments_numpy_fishing(key, zone_level, min_base, max_base, fishing_level, bait_power, trials, start,
+                                      cumulative, chunk=None):
+    """
+    (sum, sum of squares) of the tries to finish node samples start .. start+trials, cumulative being
+    a TriesTable.cumulative covering _max_node_size
+    """
+    sizes = _sample_node_sizes_numpy_fishing(zone_level, min_base, max_base, fishing_level, bait_power, trials,
+                                             _node_rolls(key, trials, start))
+    tries = cumulative[np.clip(sizes.astype(np.int64), 0, None)]
+    return float(tries.sum()), float(np.dot(tries, tries))
 
 
-Gathering.register(Fishing)
-
 # Numba JITFishing section
 try:
-    from numba import jit
+    from numba import get_num_threads, njit, prange
+
+    HAS_NUMBA = True
 
 
-    @jit()
+    @njit(cache=True)
     def _calculate_node_resources_jit_fishing(zone_level, min_base, max_base, fishing_level, bait_power, trials):
         total_resources = 0
         for i in range(trials):
@@ -246,45 +582,202 @@ try:
             total_resources += np.floor(np.random.rand() * delta + small)
         return total_resources / trials
 
-except ImportError:
-    def jit(*args, **kwargs):
-        def decorator(func):
-            return func
 
-        return decorator
+    @njit(cache=True)
+    def _sample_node_sizes_jit_fishing(zone_level, min_base, max_base, fishing_level, bait_power, trials):
+        node_resources = np.empty(trials)
+        for i in range(trials):
+            node_resources[i] = _calculate_node_resources_jit_fishing(zone_level, min_base, max_base, fishing_level,
+                                                                      bait_power, 1)
+        return node_resources
 
 
-    def _calculate_node_resources_jit_fishing(zone_level, min_base, max_base, fishing_level, bait_power, trials):
-        maximum_node_size = np.floor(max_base + (np.random.rand(trials) * (fishing_level - zone_level) / 8) + np.floor(
-            np.random.rand(trials) * bait_power / 20))
-        minimum_node_size = np.floor(min_base + (np.random.rand(trials) * (fishing_level - zone_level) / 6) + np.floor(
-            np.random.rand(trials) * bait_power / 10))
+    @njit(cache=True)
+    def _splitmix64_uniform(key, counter):
+        z = key + (counter + np.uint64(1)) * _GOLDEN
+        z = (z ^ (z >> np.uint64(30))) * _MIX1
+        z = (z ^ (z >> np.uint64(27))) * _MIX2
+        z = z ^ (z >> np.uint64(31))
+        return (z >> np.uint64(11)) * (1.0 / 9007199254740992.0)
+
+
+    @njit(cache=True)
+    def _stream_node_size(key, sample, zone_level, min_base, max_base, fishing_level, bait_power):
+        """
+        Node size of sample `sample` of the stream `key`, same draws as _node_rolls
+        """
+        first = np.uint64(sample * _DRAWS)
+        maximum_node_size = np.floor(max_base + (_splitmix64_uniform(key, first) * (fishing_level - zone_level) / 8)
+                                     + np.floor(_splitmix64_uniform(key, first + np.uint64(1)) * bait_power / 20))
+        minimum_node_size = np.floor(min_base + (_splitmix64_uniform(key, first + np.uint64(2))
+                                                 * (fishing_level - zone_level) / 6)
+                                     + np.floor(_splitmix64_uniform(key, first + np.uint64(3)) * bait_power / 10))
 
         lucky_chance = 0.05 + (bait_power / 2000)
-        lucky_rolls = np.random.rand(trials) <= lucky_chance
-        minimum_node_size = minimum_node_size * (1 + 0.5 * lucky_rolls)
-        maximum_node_size = maximum_node_size * (1 + 2.0 * lucky_rolls)
+        if _splitmix64_uniform(key, first + np.uint64(4)) <= lucky_chance:
+            minimum_node_size *= 1.5
+            maximum_node_size *= 3.0
 
         delta = abs(maximum_node_size - minimum_node_size)
-        small = np.min([maximum_node_size, minimum_node_size], axis=0)
-        total_resources = sum(np.floor(np.random.rand(trials) * delta + small))
-        return total_resources / trials
+        small = min(maximum_node_size, minimum_node_size)
+        return np.floor(_splitmix64_uniform(key, first + np.uint64(5)) * delta + small)
+
+
+    @njit(parallel=True, cache=True)
+    def _node_resources_moments_jit_fishing(key, zone_level, min_base, max_base, fishing_level, bait_power, trials,
+                                            start, chunk):
+        chunks = (trials + chunk - 1) // chunk
+        sums = np.zeros(chunks)
+        squares = np.zeros(chunks)
+        for c in prange(chunks):
+            for i in range(c * chunk, min(trials, (c + 1) * chunk)):
+                size = _stream_node_size(key, start + i, zone_level, min_base, max_base, fishing_level, bait_power)
+                sums[c] += size
+                squares[c] += size * size
+        return sums.sum(), squares.sum()
+
+
+    @njit(parallel=True, cache=True)
+    def _node_tries_moments_jit_fishing(key, zone_level, min_base, max_base, fishing_level, bait_power, trials, start,
+                                        cumulative, chunk):
+        chunks = (trials + chunk - 1) // chunk
+        sums = np.zeros(chunks)
+        squares = np.zeros(chunks)
+        for c in prange(chunks):
+            for i in range(c * chunk, min(trials, (c + 1) * chunk)):
+                size = _stream_node_size(key, start + i, zone_level, min_base, max_base, fishing_level, bait_power)
+                tries = cumulative[max(0, int(size))]
+                sums[c] += tries
+                squares[c] += tries * tries
+        return sums.sum(), squares.sum()
+
+except ImportError:
+    HAS_NUMBA = False
+
+
+    def get_num_threads():
+        return 1
+
+
+    _calculate_node_resources_jit_fishing = _calculate_node_resources_numpy_fishing
+    _sample_node_sizes_jit_fishing = _sample_node_sizes_numpy_fishing
+    _node_resources_moments_jit_fishing = _node_resources_moments_numpy_fishing
+    _node_tries_moments_jit_fishing = _node_tries_moments_numpy_fishing
+
+
+def node_moments(key, zone_level, min_base, max_base, fishing_level, bait_power, trials, start=0, tries=None):
+    """
+    (sum, sum of squares) over node samples start .. start+trials of the stream `key` (see node_key)
+    of the node size, or of the tries to finish the node when `tries` is its TriesTable. Runs on all
+    cores with numba; identical draws with or without it.
+    """
+    chunk = _chunk_size(trials)
+    if tries is None:
+        return _node_resources_moments_jit_fishing(key, zone_level, min_base, max_base, fishing_level, bait_power,
+                                                   trials, start, chunk)
+    tries.lookup([_max_node_size(zone_level, min_base, max_base, fishing_level, bait_power)])
+    return _node_tries_moments_jit_fishing(key, zone_level, min_base, max_base, fishing_level, bait_power, trials,
+                                           start, tries.cumulative, chunk)
+
+
+# Chunks per thread (load balance) and smallest chunk (scheduling overhead) of the numba moment kernels
+_CHUNKS_PER_THREAD = 4
+_MIN_CHUNK = 256
+
+
+def _chunk_size(trials):
+    """
+    Samples per chunk of the numba moment kernels: a few chunks per thread, so every core gets work
+    at the default 10000 trials. Node sizes are integers, so their sums do not depend on the
+    chunking; tries sums can differ in the last bits between thread counts.
+    """
+    chunks = _CHUNKS_PER_THREAD * get_num_threads()
+    return max(_MIN_CHUNK, (trials + chunks - 1) // chunks)
 
 
-@jit
 def _average_tries_to_finish_node_jit_fishing(base_chance, zone_level, min_base, max_base, fishing_level, bait_power,
                                               fishing, trials):
-    node_resources = np.array(
-        [int(_calculate_node_resources_jit_fishing(zone_level, min_base, max_base, fishing_level, bait_power, 1)) for
-         _ in range(trials)])
-    min_node_count = min(node_resources)
-    max_node_count = max(node_resources)
-    node_average = []
-    for total_node_resources in range(min_node_count, max_node_count + 1):
-        total_tries_sub = 0.0
-        for n_res in range(total_node_resources, 0, -1):
-            never_tell_me_the_odds = min(1.0, base_chance + fishing * 0.025 + n_res / 48)
-            total_tries_sub += 1 / never_tell_me_the_odds
-        node_average.append(total_tries_sub)
-    node_average = np.array(node_average)
-    return np.mean(node_average[(node_resources - min_node_count)])
+    node_resources = _sample_node_sizes_jit_fishing(zone_level, min_base, max_base, fishing_level, bait_power, trials)
+    return np.mean(_tries_to_finish(node_resources, base_chance, fishing))
+
+
+# Exact distribution section
+# Every random input of the node size is a bounded uniform or a Bernoulli, so the node size
+# distribution can be enumerated exactly over the floor lattice instead of sampled.
+def _floor_uniform_pmf(low, high):
+    """
+    Distribution of floor(X) for X uniform between low and high: (values, probabilities)
+    """
+    low, high = min(low, high), max(low, high)
+    if high == low:
+        return np.array([np.floor(low)]), np.array([1.0])
+    values = np.arange(np.floor(low), np.floor(high) + 1)
+    probabilities = (np.minimum(values + 1, high) - np.maximum(values, low)) / (high - low)
+    keep = probabilities > 0
+    return values[keep], probabilities[keep]
+
+
+def _sum_pmf(pmf_a, pmf_b):
+    """
+    Distribution of the sum of two independent integer valued variables
+    """
+    (values_a, prob_a), (values_b, prob_b) = pmf_a, pmf_b
+    return np.arange(len(values_a) + len(values_b) - 1) + values_a[0] + values_b[0], np.convolve(prob_a, prob_b)
+
+
+@lru_cache(maxsize=4096)
+def node_size_distribution(zone_level, min_base, max_base, fishing_level, bait_power):
+    """
+    Exact distribution of the fishing node size, matching the sampling in
+    _calculate_node_resources_jit_fishing. Returns read-only (sizes, probabilities).
+    """
+    # floor(base + U*a + floor(V*b)) == floor(V*b) + floor(base + U*a), the two terms are independent
+    maximum_node_size = _sum_pmf(_floor_uniform_pmf(max_base, max_base + (fishing_level - zone_level) / 8),
+                                 _floor_uniform_pmf(0, bait_power / 20))
+    minimum_node_size = _sum_pmf(_floor_uniform_pmf(min_base, min_base + (fishing_level - zone_level) / 6),
+                                 _floor_uniform_pmf(0, bait_power / 10))
+    lucky_chance = min(1.0, max(0.0, 0.05 + (bait_power / 2000)))
+
+    # Every (maximum, minimum, lucky) combination gives a uniform draw between the two sizes
+    big, small = np.meshgrid(maximum_node_size[0], minimum_node_size[0], indexing='ij')
+    weight = np.outer(maximum_node_size[1], minimum_node_size[1]).ravel()
+    ends = np.concatenate([np.stack([big.ravel(), small.ravel()], axis=1),
+                           np.stack([big.ravel() * 3.0, small.ravel() * 1.5], axis=1)])
+    weight = np.concatenate([weight * (1 - lucky_chance), weight * lucky_chance])
+    low, high = ends.min(axis=1), ends.max(axis=1)
+
+    # Each interval puts (overlap / width) of its weight on every integer cell it covers: the two end
+    # cells get partial overlaps, the cells in between a constant share added through a difference array
+    first = np.floor(low.min())
+    start, stop = (np.floor(low) - first).astype(np.int64), (np.floor(high) - first).astype(np.int64)
+    cells = int(stop.max()) + 2
+    width = np.where(high > low, high - low, 1.0)
+    density = np.where(high > low, weight / width, 0.0)
+    same = (start == stop)
+    probabilities = np.zeros(cells)
+    probabilities += np.bincount(start[same], weights=weight[same], minlength=cells)
+    split = ~same
+    probabilities += np.bincount(start[split], weights=density[split] * (np.floor(low[split]) + 1 - low[split]),
+                                 minlength=cells)
+    probabilities += np.bincount(stop[split], weights=density[split] * (high[split] - np.floor(high[split])),
+                                 minlength=cells)
+    steps = np.bincount(start[split] + 1, weights=density[split], minlength=cells) \
+            - np.bincount(stop[split], weights=density[split], minlength=cells)
+    probabilities += np.cumsum(steps)
+    sizes = np.arange(cells) + first
+    keep = probabilities > 1e-15
+    sizes, probabilities = sizes[keep], probabilities[keep] / probabilities[keep].sum()
+    sizes.flags.writeable = False
+    probabilities.flags.writeable = False
+    return sizes, probabilities
+
+
+def _calculate_node_resources_exact_fishing(zone_level, min_base, max_base, fishing_level, bait_power, trials=None):
+    sizes, probabilities = node_size_distribution(zone_level, min_base, max_base, fishing_level, bait_power)
+    return float(np.dot(sizes, probabilities))
+
+
+def _average_tries_to_finish_node_exact_fishing(base_chance, zone_level, min_base, max_base, fishing_level,
+                                                bait_power, fishing, trials=None):
+    sizes, probabilities = node_size_distribution(zone_level, min_base, max_base, fishing_level, bait_power)
+    return float(np.dot(_tries_to_finish(sizes, base_chance, fishing), probabilities))
@@ -0,0 +1,396 @@
+"""
+Fishing node backends: every way of estimating the average node size and the average tries to
+finish a node, behind one batched interface.
+
+    node_resources(features)   features rows: [zone_level, min_base, max_base, effective_level, bait_power]
+    tries_to_finish(features)  features rows: [base_chance, zone_level, min_base, max_base, fishing_level,
+                                               bait_power, fishing_enchant]
+
+Both return one float per row. benchmark_backends measures each backend against the exact
+distributions (or, opt-in, a high-trial Monte Carlo reference) over a grid of zones and stats;
+select_backend picks the fastest backend within an error tolerance.
+
+    python -m idlescape.fishing_backends [--tolerance 0.01] [--reference-trials 200000]
+"""
+import argparse
+import time
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+from . import fishing
+from . import surrogates
+from .gamedata import GameData
+from .kernel_cache import KERNEL_VERSION, KernelCache
+
+RESOURCE_FEATURES = ('zone_level', 'min_base', 'max_base', 'effective_level', 'bait_power')
+TRIES_FEATURES = ('base_chance', 'zone_level', 'min_base', 'max_base', 'fishing_level', 'bait_power',
+                  'fishing_enchant')
+
+
+class FishingBackend(ABC):
+    """
+    Base class of the fishing backends. batch_locations tells Fishing to send the nodes of every
+    location in one call (cheap rows, expensive calls) rather than one location at a time.
+    """
+    name = None
+    batch_locations = False
+
+    @abstractmethod
+    def node_resources(self, features):
+        pass
+
+    @abstractmethod
+    def tries_to_finish(self, features):
+        pass
+
+    def estimate(self, resources, tries):
+        """
+        (sizes, size standard errors, tries, tries standard errors). Only sampling backends have a
+        non-zero standard error.
+        """
+        sizes = self.node_resources(resources)
+        actions = self.tries_to_finish(tries)
+        return sizes, np.zeros(len(sizes)), actions, np.zeros(len(actions))
+
+    def __repr__(self):
+        return f'{type(self).__name__}({self.name})'
+
+
+class MonteCarloBackend(FishingBackend):
+    """
+    Sampled node sizes (numba on every core when available, NumPy otherwise).
+
+    With a seed the draws are common random numbers: they depend on the node and not on the player
+    stats, so results are reproducible and differences between two gear sets are not swamped by
+    sampling noise. With a target_error, sampling stops as soon as the standard error is below
+    target_error times the estimate (at most `trials` samples, starting from min_trials and doubling).
+    """
+
+    def __init__(self, trials=10000, seed=None, target_error=None, min_trials=500):
+        self.trials = int(trials)
+        self.seed = seed
+        self.target_error = target_error
+        self.min_trials = min(int(min_trials), self.trials)
+        self.name = f'montecarlo-{self.trials}'
+        if target_error is not None:
+            self.name += f'-se{target_error:g}'
+
+    def _sample(self, row, tries=None):
+        """
+        Mean and standard error of the node size (or of the tries to finish it, given its TriesTable)
+        for one node. Adaptive sampling extends the same stream, so it only ever adds samples.
+        """
+        zone_level, min_base, max_base, fishing_level, bait_power = row
+        key = fishing.node_key(self.seed, zone_level, min_base, max_base)
+        trials = self.trials if self.target_error is None else self.min_trials
+        count = 0
+        total = 0.0
+        squares = 0.0
+        while True:
+            (batch_total, batch_squares) = fishing.node_moments(key, zone_level, min_base, max_base, fishing_level,
+                                                                bait_power, trials, count, tries)
+            count += trials
+            total += batch_total
+            squares += batch_squares
+            mean = total / count
+            variance = max(0.0, squares / count - mean ** 2) * count / max(count - 1, 1)
+            error = float(np.sqrt(variance / count))
+            if self.target_error is None or count >= self.trials or error <= self.target_error * max(abs(mean), 1):
+                return mean, error
+            trials = min(count, self.trials - count)
+
+    def _sample_resources(self, features):
+        return np.array([self._sample(row) for row in np.asarray(features, dtype=float).tolist()],
+                        dtype=float).reshape(-1, 2)
+
+    def _sample_tries(self, features):
+        results = []
+        for (base_chance, *row, fishing_enchant) in np.asarray(features, dtype=float).tolist():
+            results.append(self._sample(row, fishing.tries_table(base_chance, fishing_enchant)))
+        return np.array(results, dtype=float).reshape(-1, 2)
+
+    def node_resources(self, features):
+        return self._sample_resources(features)[:, 0]
+
+    def tries_to_finish(self, features):
+        return self._sample_tries(features)[:, 0]
+
+    def estimate(self, resources, tries):
+        sizes = self._sample_resources(resources)
+        actions = self._sample_tries(tries)
+        return sizes[:, 0], sizes[:, 1], actions[:, 0], actions[:, 1]
+
+
+class ExactBackend(FishingBackend):
+    """
+    Expectations over the exact node size distribution
+    """
+    name = 'exact'
+
+    def node_resources(self, features):
+        return np.array([fishing._calculate_node_resources_exact_fishing(*row)
+                         for row in np.asarray(features, dtype=float).tolist()], dtype=float)
+
+    def tries_to_finish(self, features):
+        return np.array([fishing._average_tries_to_finish_node_exact_fishing(*row)
+                         for row in np.asarray(features, dtype=float).tolist()], dtype=float)
+
+
+class SurrogateBackend(FishingBackend):
+    """
+    A pair of fitted models with a predict(features) method
+    """
+    batch_locations = True
+
+    def __init__(self, resources_model, trials_model):
+        self.resources_model = resources_model
+        self.trials_model = trials_model
+
+    def node_resources(self, features):
+        features = np.asarray(features, dtype=float)
+        if len(features) == 0:
+            return np.zeros(0)
+        return np.ravel(self.resources_model.predict(features)).astype(float)
+
+    def tries_to_finish(self, features):
+        features = np.asarray(features, dtype=float)
+        if len(features) == 0:
+            return np.zeros(0)
+        return np.ravel(self.trials_model.predict(features)).astype(float)
+
+
+class CastnetBackend(SurrogateBackend):
+    """
+    Castnet neural network surrogates (runtime 'tflite' or 'numpy')
+    """
+
+    def __init__(self, resources_model, trials_model, runtime='tflite'):
+        super().__init__(resources_model, trials_model)
+        self.name = f'castnet-{runtime}'
+
+    @classmethod
+    def load(cls, runtime='tflite', **kwargs):
+        npz = '.npz' if runtime == 'numpy' else ''
+        resources = kwargs.get("castnet_resources", surrogates.CASTNET_RESOURCES + npz)
+        trials = kwargs.get("castnet_trials", surrogates.CASTNET_TRIALS + npz)
+        return cls(surrogates.castnet_model(resources, runtime), surrogates.castnet_model(trials, runtime), runtime)
+
+
+class DriftwoodBackend(SurrogateBackend):
+    """
+    Driftwood (joblib) regression surrogates
+    """
+    name = 'driftwood'
+
+    @classmethod
+    def load(cls, **kwargs):
+        return cls(surrogates.driftwood_model(kwargs.get("driftwood_resources", surrogates.DRIFTWOOD_RESOURCES)),
+                   surrogates.driftwood_model(kwargs.get("driftwood_trials", surrogates.DRIFTWOOD_TRIALS)))
+
+
+class CachedBackend(FishingBackend):
+    """
+    Wraps a backend with a persistent KernelCache: only rows missing from the cache are computed
+    """
+
+    def __init__(self, backend, cache, version=''):
+        self.backend = backend
+        self.cache = cache
+        self.name = backend.name
+        self.batch_locations = backend.batch_locations
+        self.namespace = f'{KERNEL_VERSION}|{version}|{backend.name}|{getattr(backend, "seed", None)}'
+
+    def _lookup(self, kind, features):
+        features = np.asarray(features, dtype=float)
+        keys = [self.cache.key(self.namespace, kind, row) for row in features.tolist()]
+        found = self.cache.get_many(keys)
+        missing = np.array([i for (i, k) in enumerate(keys) if k not in found], dtype=np.int64)
+        return features, keys, found, missing
+
+    @staticmethod
+    def _merge(keys, found, missing, means, errors):
+        values = np.array([found.get(k, (np.nan, np.nan)) for k in keys], dtype=float).reshape(-1, 2)
+        values[missing, 0] = means
+        values[missing, 1] = errors
+        return values
+
+    def estimate(self, resources, tries):
+        resources, resource_keys, resources_found, resources_missing = self._lookup('resources', resources)
+        tries, tries_keys, tries_found, tries_missing = self._lookup('tries', tries)
+        sizes, sizes_error, actions, actions_error = self.backend.estimate(resources[resources_missing],
+                                                                           tries[tries_missing])
+        new = {resource_keys[i]: v for (i, v) in zip(resources_missing, zip(sizes, sizes_error))}
+        new.update({tries_keys[i]: v for (i, v) in zip(tries_missing, zip(actions, actions_error))})
+        if len(new) > 0:
+            self.cache.put_many(new)
+        sizes = self._merge(resource_keys, resources_found, resources_missing, sizes, sizes_error)
+        actions = self._merge(tries_keys, tries_found, tries_missing, actions, actions_error)
+        return sizes[:, 0], sizes[:, 1], actions[:, 0], actions[:, 1]
+
+    def node_resources(self, features):
+        return self.estimate(features, np.zeros((0, len(TRIES_FEATURES))))[0]
+
+    def tries_to_finish(self, features):
+        return self.estimate(np.zeros((0, len(RESOURCE_FEATURES))), features)[2]
+
+
+def make_backend(name, **kwargs):
+    """
+    Backend by name: 'montecarlo', 'exact', 'castnet' or 'driftwood'. kwargs are the Fishing options
+    (accuracy, seed, target_error, castnet_runtime and the model paths).
+    """
+    if name == 'montecarlo':
+        return MonteCarloBackend(kwargs.get("accuracy", 10000), kwargs.get("seed", None),
+                                 kwargs.get("target_error", None))
+    elif name == 'exact':
+        return ExactBackend()
+    elif name == 'castnet':
+        return CastnetBackend.load(kwargs.get("castnet_runtime", "tflite"), **kwargs)
+    elif name == 'driftwood':
+        return DriftwoodBackend.load(**kwargs)
+    raise ValueError(f'Unknown fishing backend {name}')
+
+
+def with_kernel_cache(backend, kernel_cache, game_data=None):
+    """
+    Wrap backend in a CachedBackend. kernel_cache is a KernelCache, a database path or True for
+    the default database in the idlescape cache directory.
+    """
+    if kernel_cache is None or kernel_cache is False:
+        return backend
+    if kernel_cache is True:
+        kernel_cache = KernelCache()
+    elif not isinstance(kernel_cache, KernelCache):
+        kernel_cache = KernelCache(kernel_cache)
+    return CachedBackend(backend, kernel_cache, GameData.resolve(game_data).version)
+
+
+# Benchmark harness
+def feature_grid(game_data=None, level_offsets=(0, 40, 100), bait_powers=(0, 60, 200), enchants=(0, 3)):
+    """
+    (resources, tries) feature arrays for every fishing node crossed with a grid of player stats
+    (levels relative to the zone level, bait power, fishing enchant)
+    """
+    game_data = GameData.resolve(game_data)
+    resources, tries = [], []
+    for location in game_data.action_locations("Action-Fishing").values():
+        for node in location.nodes.values():
+            for offset in level_offsets:
+                level = location.level + offset
+                for bait_power in bait_powers:
+                    for enchant in enchants:
+                        # Fishing._node_base_chance with no gear bonuses
+                        base_chance = 0.4 + (level - location.level * 1.25) / 275 + enchant * 0.025 + bait_power / 200
+                        resources.append([location.level, node.minimum_base_amount, node.maximum_base_amount, level,
+                                          bait_power])
+                        tries.append([base_chance, location.level, node.minimum_base_amount,
+                                      node.maximum_base_amount, level, bait_power, enchant])
+    return np.array(resources, dtype=float), np.array(tries, dtype=float)
+
+
+def _relative_error(values, reference):
+    return np.abs(values - reference) / np.maximum(np.abs(reference), 1)
+
+
+def _timed(func, features, repeat):
+    values = func(features)  # warm up (numba compilation, lazy model allocation)
+    best = np.inf
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        func(features)
+        best = min(best, time.perf_counter() - t0)
+    return values, best
+
+
+def benchmark_backends(backends, reference=None, grid=None, repeat=3):
+    """
+    Error against the reference backend (default: the exact distributions) and latency of each
+    backend over the feature grid. Returns one dict per backend.
+    """
+    reference = reference if reference is not None else ExactBackend()
+    resources, tries = grid if grid is not None else feature_grid()
+    reference_resources = reference.node_resources(resources)
+    reference_tries = reference.tries_to_finish(tries)
+    report = []
+    for backend in backends:
+        resource_values, resource_time = _timed(backend.node_resources, resources, repeat)
+        tries_values, tries_time = _timed(backend.tries_to_finish, tries, repeat)
+        resource_error = _relative_error(resource_values, reference_resources)
+        tries_error = _relative_error(tries_values, reference_tries)
+        report.append({
+            'backend': backend,
+            'name': backend.name,
+            'rows': len(resources),
+            'resources_mean_error': float(resource_error.mean()),
+            'resources_max_error': float(resource_error.max()),
+            'tries_mean_error': float(tries_error.mean()),
+            'tries_max_error': float(tries_error.max()),
+            'error': float(max(resource_error.max(), tries_error.max())),
+            'latency': resource_time + tries_time,
+        })
+    return report
+
+
+def format_report(report):
+    lines = [f'{"backend":>20} {"rows":>6} {"size err":>9} {"size max":>9} {"tries err":>9} {"tries max":>9} '
+             f'{"ms":>9} {"us/row":>8}']
+    for r in report:
+        lines.append(f'{r["name"]:>20} {r["rows"]:6d} {r["resources_mean_error"]:9.2e} {r["resources_max_error"]:9.2e} '
+                     f'{r["tries_mean_error"]:9.2e} {r["tries_max_error"]:9.2e} {r["latency"] * 1e3:9.2f} '
+                     f'{r["latency"] / max(r["rows"], 1) * 1e6:8.2f}')
+    return '\n'.join(lines)
+
+
+def default_backends():
+    return [ExactBackend(), MonteCarloBackend(1000), MonteCarloBackend(10000)]
+
+
+_default_report = None
+
+
+def select_backend(tolerance, backends=None, report=None, **kwargs):
+    """
+    Fastest backend whose worst relative error over the benchmark grid is within tolerance, or the
+    most accurate one when none is. The default backends are benchmarked once per process on a
+    reduced grid.
+    """
+    global _default_report
+    if report is None:
+        if backends is None:
+            if _default_report is None:
+                _default_report = benchmark_backends(default_backends(), ExactBackend(),
+                                                     feature_grid(level_offsets=(0, 60), bait_powers=(0, 150),
+                                                                  enchants=(0,)))
+            report = _default_report
+        else:
+            report = benchmark_backends(backends, **kwargs)
+    passing = [r for r in report if r['error'] <= tolerance]
+    if len(passing) == 0:
+        return min(report, key=lambda r: r['error'])['backend']
+    return min(passing, key=lambda r: r['latency'])['backend']
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--reference-trials', type=int, default=None,
+                        help='Monte Carlo reference with this many trials (default: exact distributions)')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--tolerance', type=float, default=None)
+    parser.add_argument('--castnet', default=None, help='castnet runtime to include (tflite or numpy)')
+    parser.add_argument('--driftwood', action='store_true')
+    options = parser.parse_args(args)
+    backends = default_backends()
+    if options.castnet is not None:
+        backends.append(CastnetBackend.load(options.castnet))
+    if options.driftwood:
+        backends.append(DriftwoodBackend.load())
+    reference = None if options.reference_trials is None else MonteCarloBackend(options.reference_trials)
+    report = benchmark_backends(backends, reference, repeat=options.repeat)
+    print(format_report(report))
+    if options.tolerance is not None:
+        print(f'Selected for tolerance {options.tolerance}: {select_backend(options.tolerance, report=report).name}')
+
+
+if __name__ == '__main__':
+    main()
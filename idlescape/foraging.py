@@ -3,23 +3,29 @@ from abc import ABC
 import numpy as np
 from .gathering import *
 from .character import *
+from .gamedata import GameData
 
 
 class Foraging(Gathering, ABC):
     player = None
+    action_type = "Action-Foraging"
+    fingerprint_attributes = ('foraging_level', 'foraging_bonus', 'foraging_set_bonus')
+    fingerprint_enchantments = Gathering.fingerprint_enchantments + ('nature', 'herbalist', 'seedHarvesting')
 
-    def __init__(self, character, location_data, **kwargs):
+    def __init__(self, character, location_data=None, **kwargs):
         self.player = character
         self.items = self.player.item_data
-        self.locations = select_action_locations(location_data, self.items, "Action-Foraging")
+        self.game_data = GameData.resolve(location_data, self.player.game_data)
+        self.locations = self.game_data.action_locations(self.action_type)
         self.alt_experience = kwargs.get("alt_experience", None)
+        self.cache_size = kwargs.get("cache_size", 256)
+        self.cache_clear()
 
     def get_action_primary_attribute(self):
         return 'foraging_level'
 
     def get_maximum_experience(self):
-        zone_xp_list = [self.zone_experience_rate(loc.name) for (k, loc) in self.locations.items()]
-        return max(zone_xp_list)
+        return max(self.experience_rates().tolist())
 
     def _effective_level(self):
         return self.player.foraging_level + self.player.foraging_bonus * (1 + self.player.foraging_set_bonus)
@@ -40,6 +46,14 @@ class Foraging(Gathering, ABC):
         total_frequency = sum([v for (k, v) in frequency_dict.items()])
         return {k: v / total_frequency for (k, v) in frequency_dict.items()}
 
+    def _node_rate_array(self, table):
+        bonus = {"tree": self.player.enchantments.get("nature", 0),
+                 "plants": self.player.enchantments.get("herbalist", 0),
+                 "seeds": self.player.enchantments.get("seedHarvesting", 0)}
+        frequency = table.node_frequency + np.array([sum(v for (k, v) in bonus.items() if k in tags)
+                                                     for tags in table.node_tags])
+        return table.location_share(np.maximum(0, np.minimum(table.node_max_frequency, frequency)))
+
     def _average_node_size(self, location, node):
         return (node.maximum_base_amount + node.minimum_base_amount) / 2
 
@@ -53,17 +67,7 @@ class Foraging(Gathering, ABC):
         location = self.get_location_by_name(location_name)
         if location.level > self.player.foraging_level:
             return 0
-        if self.alt_experience is not None:
-            return self.alt_experience.get(location_name, 0) * self.zone_action_rate(location_name)
-        haste = self.player.enchantments.get('haste', 0)
-        rate_modifier = (self._effective_level() + 99) / 100 * (1 + haste * 0.04)
-        item_hist = self.location_item_histogram(location_name, key='id')
-        summed_weighted_xp = 0
-        for (k, v) in item_hist.items():
-            item_stats = self.player.item_data[str(k)]
-            xp = item_stats.get("experience", 1)
-            summed_weighted_xp += v * xp
-        return summed_weighted_xp * rate_modifier * 3600000 / location.base_duration
+        return self.evaluate_zone(location_name).experience_rate
 
     def zone_action_rate(self, location_name):
         location = self.get_location_by_name(location_name)
@@ -0,0 +1,251 @@
+import hashlib
+import json
+import os
+from functools import cached_property, lru_cache
+
+import numpy as np
+
+
+class GameData:
+    """
+    Read-only, process-wide view of the game data files (items, locations and forges).
+    Each file is parsed at most once per process; Character, the gathering actions and
+    Smithing all share the same instance and its indexes.
+
+    Use GameData.load(...) rather than the constructor to get the shared instance. With a
+    `bundle_file` (see idlescape.bundle) items and locations come from the memory-mapped bundle.
+    """
+    _instances = dict()
+
+    def __init__(self, item_file="data/items.json", location_file="data/locations.json",
+                 forge_file="data/forges.json", bundle_file=None):
+        object.__setattr__(self, 'item_file', item_file)
+        object.__setattr__(self, 'location_file', location_file)
+        object.__setattr__(self, 'forge_file', forge_file)
+        object.__setattr__(self, 'bundle_file', bundle_file)
+
+    @classmethod
+    def load(cls, item_file="data/items.json", location_file="data/locations.json",
+             forge_file="data/forges.json", bundle_file=None):
+        key = tuple(os.path.abspath(f) if f is not None else None
+                    for f in (item_file, location_file, forge_file, bundle_file))
+        instance = cls._instances.get(key, None)
+        if instance is None:
+            instance = cls(*key)
+            cls._instances[key] = instance
+        return instance
+
+    @classmethod
+    def for_items(cls, item_data):
+        """
+        The shared GameData whose items are item_data, None when there is none. Only instances whose
+        items are already loaded are compared, so no data file is read.
+        """
+        for instance in cls._instances.values():
+            if instance._items_loaded() and instance.items is item_data:
+                return instance
+        return None
+
+    @classmethod
+    def resolve(cls, source, base=None, field='location_file'):
+        """
+        Accept either a GameData or a file path (the historical constructor argument) and
+        return the shared GameData. A path replaces `field` of `base`.
+        """
+        if isinstance(source, GameData):
+            return source
+        base = base if base is not None else cls.load()
+        if source is None:
+            return base
+        return base.replace(**{field: source})
+
+    def replace(self, **kwargs):
+        files = {'item_file': self.item_file, 'location_file': self.location_file, 'forge_file': self.forge_file,
+                 'bundle_file': self.bundle_file}
+        files.update(kwargs)
+        return GameData.load(**files)
+
+    def __setattr__(self, key, value):
+        raise AttributeError(f'{type(self).__name__} is read-only')
+
+    def __delattr__(self, key):
+        raise AttributeError(f'{type(self).__name__} is read-only')
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return GameData.load, (self.item_file, self.location_file, self.forge_file, self.bundle_file)
+
+    # Raw data
+    @cached_property
+    def bundle(self):
+        if self.bundle_file is None:
+            return None
+        from .bundle import load_bundle
+        sources = [f if os.path.exists(f) else None for f in (self.item_file, self.location_file)]
+        return load_bundle(self.bundle_file, *sources)
+
+    @cached_property
+    def _bundle_items(self):
+        return self.bundle.items()
+
+    @property
+    def items(self):
+        if self.bundle is not None:
+            return self._bundle_items
+        return _load_items(os.path.abspath(self.item_file))
+
+    def _items_loaded(self):
+        if self.bundle_file is not None:
+            return '_bundle_items' in self.__dict__
+        return os.path.abspath(self.item_file) in _loaded_item_files
+
+    @property
+    def locations(self):
+        return _load_json(os.path.abspath(self.location_file))
+
+    @property
+    def forges(self):
+        return _load_json(os.path.abspath(self.forge_file))
+
+    @cached_property
+    def version(self):
+        """
+        Short content hash of the bundle, item and location files
+        """
+        digest = hashlib.sha256()
+        for data_file in (self.bundle_file, self.item_file, self.location_file):
+            if data_file is not None and os.path.exists(data_file):
+                with open(data_file, 'rb') as ff:
+                    digest.update(hashlib.sha256(ff.read()).digest())
+        return digest.hexdigest()[:16]
+
+    # Indexes
+    @cached_property
+    def items_by_id(self):
+        return {int(k): v for (k, v) in self.items.items()}
+
+    @cached_property
+    def item_ids_by_name(self):
+        return {v['name']: int(k) for (k, v) in self.items.items()}
+
+    @cached_property
+    def item_lookup_table(self):
+        if self.bundle is not None:
+            return self.bundle.item_names()
+        return {v['name']: k for (k, v) in self.items.items()}
+
+    @cached_property
+    def items_by_slot(self):
+        index = dict()
+        for (k, v) in self.items_by_id.items():
+            if v.get("class", "") != 'equipment':
+                continue
+            slot = v.get("equipmentStats", dict()).get("slot", None)
+            if slot is not None:
+                index.setdefault(slot, []).append(k)
+        return {k: tuple(v) for (k, v) in index.items()}
+
+    @cached_property
+    def items_by_skill(self):
+        index = dict()
+        for (k, v) in self.items_by_id.items():
+            skill = v.get("relatedSkill", v.get("skill", None))
+            if skill is not None:
+                index.setdefault(skill, []).append(k)
+        return {k: tuple(v) for (k, v) in index.items()}
+
+    @cached_property
+    def equipment_index(self):
+        """
+        Items by slot and related skill (see idlescape.character.EquipmentIndex)
+        """
+        from .character import EquipmentIndex
+        return EquipmentIndex(self.items)
+
+    @cached_property
+    def item_stats(self):
+        """
+        Equipment stat vectors of every item (see idlescape.itemstats)
+        """
+        from .itemstats import ItemStatTable
+        return ItemStatTable(self.items, self.item_lookup_table)
+
+    @cached_property
+    def item_sources(self):
+        """
+        Item id -> gathering locations yielding it (see idlescape.sources.ItemSourceIndex)
+        """
+        from .sources import ItemSourceIndex
+        return ItemSourceIndex(self)
+
+    def experience_vector(self, item_ids, default=1):
+        """
+        Experience of each item id as a read-only array (default where an item has none), cached
+        """
+        key = (tuple(item_ids), default)
+        cache = self.__dict__.setdefault('_experience_vectors', dict())
+        vector = cache.get(key, None)
+        if vector is None:
+            items = self.items
+            vector = np.array([items[str(k)].get("experience", default) for k in key[0]], dtype=float)
+            vector.flags.writeable = False
+            cache[key] = vector
+        return vector
+
+    def get_item(self, item):
+        """
+        Look up an item by integer id, string id or name
+        """
+        if isinstance(item, str) and not item.isdigit():
+            item = self.item_ids_by_name.get(item, None)
+            if item is None:
+                return None
+        return self.items_by_id.get(int(item), None)
+
+    def action_locations(self, action_type):
+        """
+        Locations for an action type (e.g. 'Action-Mining'), built once and shared.
+        """
+        cache = self.__dict__.setdefault('_action_locations', dict())
+        if action_type not in cache:
+            if self.bundle is not None:
+                cache[action_type] = self.bundle.action_locations(action_type)
+            else:
+                from .gathering import build_action_locations
+                cache[action_type] = build_action_locations(self.locations, self.items, action_type)
+        return dict(cache[action_type])
+
+    def location_table(self, action_type):
+        """
+        Struct-of-arrays LocationTable of the locations of an action type, built once and shared.
+        """
+        cache = self.__dict__.setdefault('_location_tables', dict())
+        if action_type not in cache:
+            from .gathering import LocationTable
+            cache[action_type] = LocationTable(self.action_locations(action_type))
+        return cache[action_type]
+
+
+@lru_cache(maxsize=None)
+def _load_json(data_file):
+    with open(data_file) as jj:
+        return json.load(jj)
+
+
+# Item files _load_items has parsed (see GameData.for_items)
+_loaded_item_files = set()
+
+
+@lru_cache(maxsize=None)
+def _load_items(data_file):
+    with open(data_file) as jj:
+        data = json.load(jj)
+    for (k, v) in data.items():
+        data[k]['name'] = data[k]['name'].replace("'", "")
+    _loaded_item_files.add(data_file)
+    return data
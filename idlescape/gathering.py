@@ -1,10 +1,26 @@
 import numpy as np
 import json
 from abc import ABC, abstractmethod
-import pandas as pd
+from collections import OrderedDict, namedtuple
+from collections.abc import Mapping
+from copy import copy
+from dataclasses import dataclass
+from types import MappingProxyType
+
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
 
 
 class Gathering(ABC):
+    action_type = None
+    # Player attributes and enchantments read by the evaluation, see _fingerprint
+    fingerprint_attributes = ()
+    fingerprint_enchantments = ('haste', 'gathering', 'empoweredGathering')
+    cache_size = 256
+    # Gear stats the rates can decrease with (see idlescape.optimizer); rates never fall when any other
+    # gear stat increases
+    gear_nonmonotone_stats = ()
+
     @property
     @abstractmethod
     def player(self):
@@ -51,35 +67,108 @@ class Gathering(ABC):
     def list_of_actions(self):
         return list(self.locations.keys())
 
+    def location_table(self):
+        return self.game_data.location_table(self.action_type)
+
     def get_location_by_name(self, name):
         if name not in self.list_of_actions():
             raise IndexError(f'{name} not in {self.list_of_actions()}')
         return self.locations[name]
 
-    def location_item_histogram(self, location_name, **kwargs):
-        location = self.get_location_by_name(location_name)
-        key = kwargs.get('key', 'name')
-        interval = kwargs.get('interval', 'action')
+    def _fingerprint(self):
+        """
+        Hashable summary of the player inputs this skill reads: evaluations are memoized on it,
+        so stats of other skills do not invalidate them
+        """
+        enchantments = self.player.enchantments
+        return tuple(getattr(self.player, k, None) for k in self.fingerprint_attributes) \
+            + tuple(enchantments.get(k, 0) for k in self.fingerprint_enchantments)
 
+    def _memoized(self, key, compute):
+        """
+        compute() memoized on (key, _fingerprint()) in an LRU of cache_size entries, key being a zone
+        name or None for experience_rates. Copies of the object (e.g. the Sequencer's) share the LRU
+        and its counters.
+        """
+        if '_zone_cache' not in self.__dict__:
+            self.cache_clear()
+        cache = self.__dict__['_zone_cache']
+        stats = self.__dict__['_zone_cache_stats']
+        key = (key, self._fingerprint())
+        value = cache.get(key, None)
+        if value is not None:
+            cache.move_to_end(key)
+            stats[0] += 1
+            return value
+        stats[1] += 1
+        value = compute()
+        if self.cache_size > 0:
+            cache[key] = value
+            if len(cache) > self.cache_size:
+                cache.popitem(last=False)
+        return value
+
+    def evaluate_zone(self, location_name):
+        """
+        Node rates, sizes, actions and times, experience and action rates (per hour) and
+        the item yield per action for a zone. Memoized on (zone, _fingerprint()) in an LRU of
+        cache_size evaluations.
+        """
+        return self._memoized(location_name, lambda: self._evaluate_zone(location_name))
+
+    def cache_info(self):
+        stats = self.__dict__.get('_zone_cache_stats', [0, 0])
+        return CacheInfo(stats[0], stats[1], self.cache_size, len(self.__dict__.get('_zone_cache', ())))
+
+    def cache_clear(self):
+        self.__dict__['_zone_cache'] = OrderedDict()
+        self.__dict__['_zone_cache_stats'] = [0, 0]
+
+    def _evaluate_zone(self, location_name):
+        """
+        One pass evaluation behind evaluate_zone
+        """
+        location = self.get_location_by_name(location_name)
         node_rates = self._node_rates(location)
         node_sizes = self._node_sizes(location)
         node_actions = self._node_actions(location)
-        action_rate = self.zone_action_rate(location_name) if (interval == 'hour') else 1
+        action_rate = self.zone_action_rate(location_name)
+        item_rates = self._item_rates(location, node_rates, node_sizes, node_actions)
+        if getattr(self, 'alt_experience', None) is not None:
+            experience_rate = self.alt_experience.get(location_name, 0) * action_rate
+        else:
+            experience = self.game_data.experience_vector(item_rates.keys())
+            experience_rate = float(np.dot(list(item_rates.values()), experience)) * action_rate
+        seconds_per_action = 3600 / action_rate if action_rate > 0 else np.inf
+        node_times = {k: v * seconds_per_action for (k, v) in node_actions.items()}
+        return ZoneEvaluation(location_name, node_rates, node_sizes, node_actions, node_times, experience_rate,
+                              action_rate, item_rates)
 
-        items = dict()
-        total_actions = 0
+    def _enchantment_effects(self):
+        """
+        (gathering, empowered gathering, total gathering, total superheat) chances
+        """
         gathering = self.player.enchantments.get("gathering", 0) * 0.10
         empowered_gathering = self.player.enchantments.get("empoweredGathering", 0) * 0.10
         total_gathering = 1 - (1 - gathering) * (1 - empowered_gathering)
         superheat = self.player.enchantments.get("superheating", 0) * 0.01
         empowered_superheat = self.player.enchantments.get("empoweredSuperheating", 0) * 0.01
         total_superheat = 1 - (1 - superheat) * (1 - empowered_superheat)
+        return gathering, empowered_gathering, total_gathering, total_superheat
+
+    def _item_rates(self, location, node_rates, node_sizes, node_actions):
+        """
+        Average item yield per action, including gathering and superheating
+        """
+        items = dict()
+        total_actions = 0
+        (gathering, empowered_gathering, total_gathering, total_superheat) = self._enchantment_effects()
         for (name, rate) in node_rates.items():
             avg_size = node_sizes[name]
             total_actions += node_actions[name] * rate
             loot_rates = self._loot_rates(location.nodes[name])
             for (itemid, loot) in location.nodes[name].loot.items():
-                item_node_rate = loot_rates[itemid] * avg_size * rate * action_rate
+                item_node_rate = loot_rates[itemid] * avg_size * rate
                 base_rate = items.get(itemid, 0) + item_node_rate * (1 + total_gathering)
                 items[itemid] = base_rate
                 if total_superheat > 0:
@@ -91,11 +180,279 @@ class Gathering(ABC):
                         items[2] = items.get(2, 0) - sh_count * 1.5 \
                                    * self.items[str(sh_id)].get('requiredResources', [{}])[0].get('2', 0)
         if gathering > 0:
-            items[517] = items.get(517, 0) - gathering * action_rate * 0.15 * total_actions * (1 - empowered_gathering)
+            items[517] = items.get(517, 0) - gathering * 0.15 * total_actions * (1 - empowered_gathering)
+        return {k: v / total_actions for (k, v) in items.items()}
+
+    # Vector forms of the node, loot and action rates over a LocationTable, for production_matrix
+    def _node_rate_array(self, table):
+        return table.location_share(np.maximum(0, table.node_frequency))
+
+    def _node_size_array(self, table):
+        return (table.node_min_base + table.node_max_base) / 2
+
+    def _node_action_array(self, table, node_sizes):
+        return node_sizes
+
+    def _loot_rate_array(self, table):
+        frequency = np.maximum(0, np.minimum(table.loot_frequency, table.loot_max_frequency))
+        return table.node_share(frequency) * (table.loot_min_amount + table.loot_max_amount) / 2
+
+    def _action_rate_array(self, table, node_rates, node_sizes, node_actions):
+        level = getattr(self.player, self.get_action_primary_attribute())
+        haste = self.player.enchantments.get('haste', 0)
+        rate_modifier = (self._effective_level() + 99) / 100 * (1 + haste * 0.04)
+        return np.where(table.level > level, 0.0, rate_modifier * 3600000 / table.base_duration)
+
+    def production_matrix(self, **kwargs):
+        """
+        Item rates of every zone at once, per hour (interval='hour', the default) or per action,
+        with gathering and superheating applied as in evaluate_zone
+        """
+        interval = kwargs.get('interval', 'hour')
+        table = self.location_table()
+        sh_table = self.sh_table
+        items = np.unique(np.concatenate([table.loot_item, list(sh_table.keys()), list(sh_table.values()),
+                                          [2] if len(sh_table) > 0 else [], [517]]).astype(np.int64))
+        column = np.searchsorted(items, table.loot_item)
+        node_rates = self._node_rate_array(table)
+        node_sizes = self._node_size_array(table)
+        node_actions = self._node_action_array(table, node_sizes)
+        (gathering, empowered_gathering, total_gathering, total_superheat) = self._enchantment_effects()
+        item_node_rate = self._loot_rate_array(table) * (node_sizes * node_rates)[table.loot_node]
+        total_actions = table.location_sum(node_actions * node_rates)
+        rates = np.zeros((len(table.names), len(items)))
+        np.add.at(rates, (table.loot_location, column), item_node_rate * (1 + total_gathering))
+        if total_superheat > 0 and len(sh_table) > 0:
+            heated = np.isin(table.loot_item, list(sh_table.keys()))
+            sh_ids = [sh_table[k] for k in table.loot_item[heated].tolist()]
+            heat = np.array([self.items[str(k)].get('requiredResources', [{}])[0].get('2', 0) for k in sh_ids])
+            sh_count = item_node_rate[heated] * total_superheat
+            locations = table.loot_location[heated]
+            np.add.at(rates, (locations, np.searchsorted(items, sh_ids)), sh_count)
+            np.add.at(rates, (locations, column[heated]), -sh_count)
+            np.add.at(rates, (locations, np.searchsorted(items, 2)), -sh_count * 1.5 * heat)
+        if gathering > 0:
+            rates[:, np.searchsorted(items, 517)] -= gathering * 0.15 * total_actions * (1 - empowered_gathering)
+        rates /= total_actions[:, np.newaxis]
+        action_rate = self._action_rate_array(table, node_rates, node_sizes, node_actions)
+        if interval == 'hour':
+            rates *= action_rate[:, np.newaxis]
+        names = tuple(self.items[str(k)]['name'] if str(k) in self.items else str(k) for k in items.tolist())
+        return ProductionMatrix(tuple(table.names), items, names, rates, action_rate, interval)
+
+    def _experience_per_action(self, matrix):
+        if getattr(self, 'alt_experience', None) is not None:
+            return np.array([self.alt_experience.get(name, 0) for name in matrix.locations], dtype=float)
+        return matrix.rates @ self.game_data.experience_vector(matrix.items.tolist())
+
+    def experience_rates(self):
+        """
+        Experience per hour of every zone of location_table(), as a read-only array. Memoized with the
+        zone evaluations, so repeated calls with the same stats (Sequencer steps between level-ups,
+        dashboard redraws) are lookups.
+        """
+        return self._memoized(None, self._read_only_experience_rates)
+
+    def _read_only_experience_rates(self):
+        rates = np.array(self._experience_rates(), dtype=float)
+        rates.flags.writeable = False
+        return rates
+
+    def _experience_rates(self):
+        matrix = self.production_matrix(interval='action')
+        return self._experience_per_action(matrix) * matrix.action_rate
+
+    def batch_rates(self, batch):
+        """
+        Experience and action rates (per hour) of every character of a CharacterBatch (see
+        idlescape.batch) at every zone of location_table(). Action rates broadcast the level and
+        haste columns over the zones; item yields only depend on the enchantments, so they are
+        evaluated once per distinct enchantment profile.
+        """
+        table = self.location_table()
+        action = copy(self)
+        action.player = batch.columns()
+        action_rate = action._action_rate_array(table, None, None, None)
+        profile = [k for k in self.fingerprint_enchantments if k != 'haste']
+        (first, inverse) = batch.unique(enchantments=profile)
+        experience = []
+        for i in first:
+            action.player = batch.character(i)
+            experience.append(self._experience_per_action(action.production_matrix(interval='action')))
+        experience = np.array(experience).reshape(len(first), len(table.names))[inverse]
+        return BatchEvaluation(tuple(table.names), experience * action_rate, action_rate)
+
+    def location_item_histogram(self, location_name, **kwargs):
+        import pandas as pd
+        key = kwargs.get('key', 'name')
+        interval = kwargs.get('interval', 'action')
+        evaluation = self.evaluate_zone(location_name)
+        action_rate = evaluation.action_rate if (interval == 'hour') else 1
         if key == 'name':
-            return pd.Series({self.items[str(k)]['name']: v / total_actions for (k, v) in items.items()})
+            return pd.Series({self.items[str(k)]['name']: v * action_rate for (k, v) in evaluation.item_rates.items()})
         else:
-            return pd.Series({k: v / total_actions for (k, v) in items.items()})
+            return pd.Series({k: v * action_rate for (k, v) in evaluation.item_rates.items()})
+
+
+@dataclass(frozen=True)
+class ZoneEvaluation:
+    """
+    Result of Gathering.evaluate_zone. Node values are keyed by node id, item rates by
+    item id (per action); experience and action rates are per hour, node times in seconds.
+    Sampled estimates carry (low, high) confidence intervals on the two rates, otherwise None.
+    """
+    location_name: str
+    node_rates: Mapping
+    node_sizes: Mapping
+    node_actions: Mapping
+    node_times: Mapping
+    experience_rate: float
+    action_rate: float
+    item_rates: Mapping
+    experience_rate_ci: tuple = None
+    action_rate_ci: tuple = None
+
+    def __post_init__(self):
+        for name in ('node_rates', 'node_sizes', 'node_actions', 'node_times', 'item_rates'):
+            object.__setattr__(self, name, MappingProxyType(dict(getattr(self, name))))
+
+
+@dataclass(frozen=True)
+class ProductionMatrix:
+    """
+    Result of Gathering.production_matrix: rates[i, j] is the rate of item items[j] (named
+    item_names[j]) at locations[i], per hour or per action (interval). Action rates are per hour.
+    """
+    locations: tuple
+    items: np.ndarray
+    item_names: tuple
+    rates: np.ndarray
+    action_rate: np.ndarray
+    interval: str = 'hour'
+
+    def column(self, item):
+        """
+        Rate of an item (id or name) at every location, zero where it is not produced
+        """
+        if isinstance(item, str) and not item.isdigit():
+            index = self.item_names.index(item) if item in self.item_names else None
+        else:
+            index = int(np.searchsorted(self.items, int(item)))
+            index = index if index < len(self.items) and self.items[index] == int(item) else None
+        if index is None:
+            return np.zeros(len(self.locations))
+        return self.rates[:, index]
+
+    def rank(self, item):
+        """
+        (location, rate) of every location, best first for an item
+        """
+        rates = self.column(item)
+        return [(self.locations[i], float(rates[i])) for i in np.argsort(-rates, kind='stable').tolist()]
+
+    def to_frame(self, key='name'):
+        import pandas as pd
+        columns = self.item_names if key == 'name' else self.items
+        return pd.DataFrame(self.rates, index=list(self.locations), columns=list(columns))
+
+    @classmethod
+    def concat(cls, matrices):
+        """
+        One matrix over the locations of several (e.g. one per skill), on the union of their items
+        """
+        items = np.unique(np.concatenate([m.items for m in matrices]))
+        names = dict()
+        for m in matrices:
+            names.update(zip(m.items.tolist(), m.item_names))
+        rates = np.zeros((sum(len(m.locations) for m in matrices), len(items)))
+        row = 0
+        for m in matrices:
+            rates[row:row + len(m.locations), np.searchsorted(items, m.items)] = m.rates
+            row += len(m.locations)
+        intervals = {m.interval for m in matrices}
+        return cls(sum((m.locations for m in matrices), ()), items, tuple(names[k] for k in items.tolist()), rates,
+                   np.concatenate([m.action_rate for m in matrices]), intervals.pop() if len(intervals) == 1 else None)
+
+
+class LocationTable:
+    """
+    Struct-of-arrays view of the locations of one action type (see build_action_locations): one
+    entry per location, node and loot, nodes pointing at their location and loot at its node.
+    """
+
+    def __init__(self, locations):
+        self.names = list(locations.keys())
+        self.level = np.array([loc.level for loc in locations.values()], dtype=float)
+        self.base_duration = np.array([loc.base_duration for loc in locations.values()], dtype=float)
+        nodes = [(i, node) for (i, loc) in enumerate(locations.values()) for node in loc.nodes.values()]
+        self.node_location = np.array([i for (i, node) in nodes], dtype=np.int64)
+        self.node_ids = [node.node_id for (i, node) in nodes]
+        self.node_tags = [tuple(node.tags) for (i, node) in nodes]
+        self.node_frequency = np.array([node.frequency for (i, node) in nodes], dtype=float)
+        self.node_max_frequency = np.array([node.max_frequency for (i, node) in nodes], dtype=float)
+        self.node_min_base = np.array([node.minimum_base_amount for (i, node) in nodes], dtype=float)
+        self.node_max_base = np.array([node.maximum_base_amount for (i, node) in nodes], dtype=float)
+        loot = [(j, item) for (j, (i, node)) in enumerate(nodes) for item in node.loot.values()]
+        self.loot_node = np.array([j for (j, item) in loot], dtype=np.int64)
+        self.loot_location = self.node_location[self.loot_node]
+        self.loot_item = np.array([item.id for (j, item) in loot], dtype=np.int64)
+        self.loot_class = np.array([item.item_class for (j, item) in loot], dtype=str)
+        self.loot_frequency = np.array([item.frequency for (j, item) in loot], dtype=float)
+        self.loot_max_frequency = np.array([item.max_frequency for (j, item) in loot], dtype=float)
+        self.loot_min_amount = np.array([item.min_amount for (j, item) in loot], dtype=float)
+        self.loot_max_amount = np.array([item.max_amount for (j, item) in loot], dtype=float)
+
+    def location_sum(self, node_values):
+        """
+        Totals of the nodes of every location, along the last axis
+        """
+        return _group_sum(node_values, self.node_location, len(self.names))
+
+    def node_sum(self, loot_values):
+        """
+        Totals of the loot of every node, along the last axis
+        """
+        return _group_sum(loot_values, self.loot_node, len(self.node_ids))
+
+    def location_share(self, node_values):
+        """
+        Node values divided by the total of their location
+        """
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return node_values / self.location_sum(node_values)[..., self.node_location]
+
+    def node_share(self, loot_values):
+        """
+        Loot values divided by the total of their node
+        """
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return loot_values / self.node_sum(loot_values)[..., self.loot_node]
+
+
+def _group_sum(values, groups, size):
+    values = np.asarray(values, dtype=float)
+    if values.ndim == 1:
+        return np.bincount(groups, weights=values, minlength=size)
+    totals = np.zeros((size,) + values.shape[:-1])
+    np.add.at(totals, groups, np.moveaxis(values, -1, 0))
+    return np.moveaxis(totals, 0, -1)
+
+
+@dataclass(frozen=True)
+class BatchEvaluation:
+    """
+    Result of Gathering.batch_rates: (n_characters, n_zones) arrays of experience and action rates
+    per hour, zones in the order of locations
+    """
+    locations: tuple
+    experience_rate: np.ndarray
+    action_rate: np.ndarray
+
+    def best_zones(self):
+        """
+        Zone with the highest experience rate of every character
+        """
+        return [self.locations[i] for i in np.argmax(self.experience_rate, axis=1).tolist()]
 
 
 class Location:
@@ -144,9 +501,16 @@ def find_required_level(df):
 
 
 def select_action_locations(datafile, item_data, action_type):
+    from .bundle import is_bundle, as_bundle
+    if is_bundle(datafile):
+        return as_bundle(datafile).action_locations(action_type)
     locations = None
     with open(datafile) as j:
         locations = json.load(j)
+    return build_action_locations(locations, item_data, action_type)
+
+
+def build_action_locations(locations, item_data, action_type):
     results = dict()
     for (k, v) in locations.items():
         if v['actionType'] == action_type:
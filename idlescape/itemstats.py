@@ -0,0 +1,110 @@
+import numpy as np
+
+# Character attribute fed by each toolBoost skill (augmentationBonus stats are 'toolBoost.<skill>')
+TOOL_BOOSTS = {
+    'mining': 'mining_bonus',
+    'foraging': 'foraging_bonus',
+    'fishing': 'fishing_bonus',
+    'fishingBaitPower': 'bait_power',
+    'fishingReelPower': 'reel_power',
+    'fishingRarityPower': 'bonus_rarity',
+}
+STATS = tuple(TOOL_BOOSTS.values())
+# Item sets and the set bonus attribute they count towards
+ITEM_SETS = {10007: 'mining_set_bonus', 10005: 'foraging_set_bonus', 10001: 'fishing_set_bonus'}
+SET_BONUS = {3: 0.2, 4: 0.4}
+# fishingBait key of each bait attribute
+BAIT = {'bait_fishing_bonus': 'level', 'bait_bait_power': 'bait', 'bait_reel_power': 'reel',
+        'bait_bonus_rarity': 'bonus'}
+
+
+class ItemStatTable:
+    """
+    Every item compiled once into fixed stat vectors: base tool boosts, boosts per augment level,
+    item set membership and bait stats. A loadout's stats are then a sum of rows, and many loadouts
+    are tallied at once with fancy indexing. The last row is all zeros and stands for empty or
+    unknown slots.
+    """
+
+    def __init__(self, items, item_lookup_table):
+        ids = list(items.keys())
+        self.row_by_id = {k: i for (i, k) in enumerate(ids)}
+        self.row_by_name = {name: self.row_by_id[k] for (name, k) in item_lookup_table.items()}
+        self.missing = len(ids)
+        self.base = np.zeros((len(ids) + 1, len(STATS)))
+        self.augment = np.zeros((len(ids) + 1, len(STATS)))
+        self.sets = np.zeros((len(ids) + 1, len(ITEM_SETS)), dtype=np.int64)
+        self.bait = np.zeros((len(ids) + 1, len(BAIT)))
+        columns = {v: i for (i, v) in enumerate(STATS)}
+        for (row, k) in enumerate(ids):
+            item = items[k]
+            equipment_stats = item.get('equipmentStats', dict())
+            for tb in equipment_stats.get('toolBoost', []):
+                if tb['skill'] in TOOL_BOOSTS:
+                    self.base[row, columns[TOOL_BOOSTS[tb['skill']]]] += tb['boost']
+            for ab in equipment_stats.get('augmentationBonus', []):
+                skill = ab['stat'][len('toolBoost.'):] if ab['stat'].startswith('toolBoost.') else None
+                if skill in TOOL_BOOSTS:
+                    self.augment[row, columns[TOOL_BOOSTS[skill]]] += ab['value']
+            item_set = equipment_stats.get('itemSet', [])
+            self.sets[row] = [s in item_set for s in ITEM_SETS]
+            fishing_bait = item.get('fishingBait', {})
+            self.bait[row] = [fishing_bait.get(v, 0) for v in BAIT.values()]
+
+    def rows(self, equipment_set):
+        """
+        (item rows, augment levels) of every slot of an EquipmentSet
+        """
+        rows = [self.row_by_name.get(str(getattr(equipment_set, slot)), self.missing)
+                for slot in equipment_set.slots]
+        augments = [int(getattr(equipment_set, f'{slot}_augment')) for slot in equipment_set.slots]
+        return rows, augments
+
+    def tally(self, equipment_sets):
+        """
+        Stats of many EquipmentSets at once: {attribute: array with one value per set}. Bait stats
+        come from the last equipped item (bait_* are NaN when no slot holds a known item), as in
+        Character._update_stats.
+        """
+        pairs = [self.rows(e) for e in equipment_sets]
+        rows = np.array([r for (r, a) in pairs], dtype=np.int64).reshape(len(pairs), -1)
+        augments = np.array([a for (r, a) in pairs], dtype=float).reshape(len(pairs), -1)
+        return self.tally_rows(rows, augments)
+
+    def tally_rows(self, rows, augments):
+        """
+        tally() on (n_sets, n_slots) arrays of item rows and augment levels
+        """
+        stats = self.base[rows].sum(axis=1) + np.einsum('nsk,ns->nk', self.augment[rows], augments)
+        ret = {name: stats[:, i] for (i, name) in enumerate(STATS)}
+        set_counts = self.sets[rows].sum(axis=1)
+        for (i, name) in enumerate(ITEM_SETS.values()):
+            ret[name] = np.select([set_counts[:, i] == n for n in SET_BONUS], list(SET_BONUS.values()), 0.0)
+        equipped = rows != self.missing
+        last = rows.shape[1] - 1 - np.argmax(equipped[:, ::-1], axis=1)
+        bait = self.bait[rows[np.arange(len(rows)), last]]
+        bait[~equipped.any(axis=1)] = np.nan
+        ret.update({name: bait[:, i] for (i, name) in enumerate(BAIT)})
+        return ret
+
+    def loadout_stats(self, equipment_set):
+        """
+        Stats of one EquipmentSet as plain numbers; bait stats are left out when no slot holds a
+        known item (the character keeps its previous bait)
+        """
+        rows, augments = self.rows(equipment_set)
+        stats = (self.base[rows].sum(axis=0) + np.dot(augments, self.augment[rows])).tolist()
+        ret = dict(zip(STATS, map(_number, stats)))
+        set_counts = self.sets[rows].sum(axis=0).tolist()
+        ret.update({name: SET_BONUS.get(n, 0.0) for (name, n) in zip(ITEM_SETS.values(), set_counts)})
+        equipped = [r for r in rows if r != self.missing]
+        if len(equipped) > 0:
+            ret.update(zip(BAIT, map(_number, self.bait[equipped[-1]].tolist())))
+        return ret
+
+
+def _number(value):
+    """
+    Integral floats back to int, as the stats summed from the item data are
+    """
+    return int(value) if value.is_integer() else value
@@ -0,0 +1,111 @@
+"""
+Persistent cache of fishing kernel results, shared by processes and kept across restarts.
+
+Results are stored in a SQLite database in WAL mode (many readers, one writer at a time, waiting on
+each other rather than failing), keyed on a namespace (kernel version, game data version and
+backend) and the quantized kernel inputs. Least recently used entries are evicted once the cache
+holds more than max_entries results. Reads only write back the recency of entries last used more
+than touch_interval seconds ago, so readers rarely contend for the writer lock (touch_interval=None
+never writes on reads: entries are evicted oldest first).
+"""
+import os
+import sqlite3
+import threading
+import time
+
+KERNEL_VERSION = 1
+
+
+class KernelCache:
+    def __init__(self, path=None, max_entries=1000000, digits=6, timeout=30, touch_interval=3600):
+        if path is None:
+            from .surrogates import cache_dir
+            path = os.path.join(cache_dir(), 'kernels.sqlite')
+        elif path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.digits = digits
+        self.timeout = timeout
+        self.touch_interval = touch_interval
+        self._local = threading.local()
+        self._writes = 0
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state['_local']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._local = threading.local()
+
+    @property
+    def connection(self):
+        """
+        Connection of the current process and thread (sqlite connections cannot cross a fork)
+        """
+        if getattr(self._local, 'pid', None) != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=self.timeout)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute('CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, mean REAL, error REAL, '
+                               'used REAL)')
+            connection.execute('CREATE INDEX IF NOT EXISTS results_used ON results (used)')
+            connection.commit()
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return self._local.connection
+
+    def key(self, namespace, kind, row):
+        return f'{namespace}|{kind}|' + ','.join(repr(round(float(v), self.digits)) for v in row)
+
+    def get_many(self, keys):
+        """
+        {key: (mean, error)} for the keys present in the cache
+        """
+        found = dict()
+        stale = []
+        now = time.time()
+        connection = self.connection
+        keys = list(keys)
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            rows = connection.execute(f'SELECT key, mean, error, used FROM results WHERE key IN '
+                                      f'({",".join("?" * len(chunk))})', chunk).fetchall()
+            found.update({k: (mean, error) for (k, mean, error, used) in rows})
+            if self.touch_interval is not None:
+                stale.extend(k for (k, mean, error, used) in rows if used < now - self.touch_interval)
+        if len(stale) > 0:
+            with connection:
+                connection.executemany('UPDATE results SET used = ? WHERE key = ?', [(now, k) for k in stale])
+        return found
+
+    def put_many(self, items):
+        """
+        Store {key: (mean, error)}
+        """
+        now = time.time()
+        connection = self.connection
+        with connection:
+            connection.executemany('INSERT OR REPLACE INTO results (key, mean, error, used) VALUES (?, ?, ?, ?)',
+                                   [(k, float(mean), float(error), now) for (k, (mean, error)) in items.items()])
+        self._writes += len(items)
+        if self._writes >= max(1, self.max_entries // 100):
+            self._writes = 0
+            self.evict()
+
+    def evict(self):
+        connection = self.connection
+        with connection:
+            count = connection.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+            if count > self.max_entries:
+                connection.execute('DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY used LIMIT ?)',
+                                   (count - self.max_entries,))
+
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+
+    def clear(self):
+        with self.connection as connection:
+            connection.execute('DELETE FROM results')
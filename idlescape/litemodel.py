@@ -25,21 +25,26 @@ class LiteModel:
         self.output_shape = output_det["shape"]
         self.input_dtype = input_det["dtype"]
         self.output_dtype = output_det["dtype"]
+        self.batch_size = self.input_shape[0]
+
+    def _resize(self, count):
+        """ Resize the input tensor to a batch of `count` rows (only reallocates when it changes). """
+        if count != self.batch_size:
+            self.interpreter.resize_tensor_input(self.input_index, [count] + list(self.input_shape[1:]))
+            self.interpreter.allocate_tensors()
+            self.batch_size = count
 
     def predict(self, inp):
-        inp = inp.astype(self.input_dtype)
+        """ Predict a whole batch with a single invoke(). """
+        inp = np.asarray(inp).astype(self.input_dtype)
         count = inp.shape[0]
-        out = np.zeros((count, self.output_shape[1]), dtype=self.output_dtype)
-        for i in range(count):
-            self.interpreter.set_tensor(self.input_index, inp[i:i + 1])
-            self.interpreter.invoke()
-            out[i] = self.interpreter.get_tensor(self.output_index)[0]
-        return out
+        if count == 0:
+            return np.zeros((0, self.output_shape[1]), dtype=self.output_dtype)
+        self._resize(count)
+        self.interpreter.set_tensor(self.input_index, inp)
+        self.interpreter.invoke()
+        return self.interpreter.get_tensor(self.output_index)
 
     def predict_single(self, inp):
         """ Like predict(), but only for a single record. The input data can be a Python list. """
-        inp = np.array([inp], dtype=self.input_dtype)
-        self.interpreter.set_tensor(self.input_index, inp)
-        self.interpreter.invoke()
-        out = self.interpreter.get_tensor(self.output_index)
-        return out[0]
\ No newline at end of file
+        return self.predict(np.array([inp]))[0]
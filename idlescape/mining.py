@@ -1,10 +1,15 @@
 import numpy as np
 from .gathering import *
 from .character import *
+from .gamedata import GameData
 
 
 class Mining(Gathering):
     player = None
+    action_type = "Action-Mining"
+    fingerprint_attributes = ('mining_level', 'mining_bonus', 'mining_set_bonus')
+    # Only mining has superheated outputs (sh_table)
+    fingerprint_enchantments = Gathering.fingerprint_enchantments + ('superheating', 'empoweredSuperheating')
     sh_table = {
         101: 201,  # Copper
         102: 201,  # Tin
@@ -18,18 +23,20 @@ class Mining(Gathering):
         115: 208,  # Void
     }
 
-    def __init__(self, character, location_data, **kwargs):
+    def __init__(self, character, location_data=None, **kwargs):
         self.player = character
         self.items = self.player.item_data
-        self.locations = select_action_locations(location_data, self.items, "Action-Mining")
+        self.game_data = GameData.resolve(location_data, self.player.game_data)
+        self.locations = self.game_data.action_locations(self.action_type)
         self.alt_experience = kwargs.get("alt_experience", None)
+        self.cache_size = kwargs.get("cache_size", 256)
+        self.cache_clear()
 
     def get_action_primary_attribute(self):
         return 'mining_level'
 
     def get_maximum_experience(self):
-        zone_xp_list = [self.zone_experience_rate(loc.name) for (k, loc) in self.locations.items()]
-        return max(zone_xp_list)
+        return max(self.experience_rates().tolist())
 
     def _effective_level(self):
         return self.player.mining_level + self.player.mining_bonus * (1 + self.player.mining_set_bonus)
@@ -55,17 +62,7 @@ class Mining(Gathering):
         location = self.get_location_by_name(location_name)
         if location.level > self.player.mining_level:
             return 0
-        if self.alt_experience is not None:
-            return self.alt_experience.get(location_name, 0) * self.zone_action_rate(location_name)
-        haste = self.player.enchantments.get('haste', 0)
-        rate_modifier = (self._effective_level() + 99) / 100 * (1 + haste * 0.04)
-        item_hist = self.location_item_histogram(location_name, key='id')
-        summed_weighted_xp = 0
-        for (k, v) in item_hist.items():
-            item_stats = self.player.item_data[str(k)]
-            xp = item_stats.get("experience", 1)
-            summed_weighted_xp += v * xp
-        return summed_weighted_xp * rate_modifier * 3600000 / location.base_duration
+        return self.evaluate_zone(location_name).experience_rate
 
     def zone_action_rate(self, location_name):
         location = self.get_location_by_name(location_name)
@@ -0,0 +1,154 @@
+"""
+TensorFlow-free runtime for the dense castnet surrogate models.
+
+Export once where TensorFlow is installed:
+
+    python -m idlescape.numpymodel Castnet_Trials Castnet_Trials.npz
+
+then load the .npz with NumpyModel.from_file anywhere NumPy runs (Pyodide, slim workers).
+"""
+import argparse
+import json
+import math
+
+import numpy as np
+
+# Vectorized math.erf: scipy is not a dependency (and not in every Pyodide build)
+_erf = np.vectorize(math.erf, otypes=[np.float64])
+
+ACTIVATIONS = {
+    'linear': lambda x: x,
+    'relu': lambda x: np.maximum(x, 0),
+    'relu6': lambda x: np.clip(x, 0, 6),
+    'leaky_relu': lambda x: np.where(x > 0, x, 0.2 * x),
+    'elu': lambda x: np.where(x > 0, x, np.expm1(np.minimum(x, 0))),
+    'selu': lambda x: 1.0507009873554805 * np.where(x > 0, x, 1.6732632423543772 * np.expm1(np.minimum(x, 0))),
+    'sigmoid': lambda x: 1 / (1 + np.exp(-x)),
+    'tanh': np.tanh,
+    'softplus': lambda x: np.logaddexp(0, x),
+    'swish': lambda x: x / (1 + np.exp(-x)),
+    'silu': lambda x: x / (1 + np.exp(-x)),
+    # Exact (erf) form, the Keras default (approximate=False)
+    'gelu': lambda x: (0.5 * x * (1 + _erf(x / np.sqrt(2)))).astype(x.dtype, copy=False),
+}
+
+# Layers that are the identity at inference time
+_PASSTHROUGH = ('InputLayer', 'Dropout', 'GaussianNoise', 'GaussianDropout', 'AlphaDropout', 'Flatten')
+
+
+class NumpyModel:
+    """
+    Batched float32 forward pass of a stack of Dense, Activation and Normalization layers.
+    Drop-in replacement for LiteModel (predict / predict_single).
+    """
+    input_dtype = np.float32
+    output_dtype = np.float32
+
+    @classmethod
+    def from_file(cls, model_path):
+        with np.load(model_path, allow_pickle=False) as data:
+            specs = json.loads(str(data['layers']))
+            layers = [(spec, [data[f'layer_{i}_{j}'] for j in range(spec['weights'])])
+                      for (i, spec) in enumerate(specs)]
+        return cls(layers)
+
+    @classmethod
+    def from_keras_model(cls, kmodel):
+        layers = []
+        for layer in kmodel.layers:
+            kind = type(layer).__name__
+            config = layer.get_config()
+            weights = [np.asarray(w, dtype=np.float32) for w in layer.get_weights()]
+            if kind in _PASSTHROUGH:
+                continue
+            elif kind == 'Dense':
+                spec = {'kind': 'dense', 'activation': _activation_name(config.get('activation', 'linear')),
+                        'use_bias': config.get('use_bias', True)}
+            elif kind == 'Activation':
+                spec = {'kind': 'activation', 'activation': _activation_name(config['activation'])}
+                weights = []
+            elif kind == 'ReLU':
+                spec = {'kind': 'activation', 'activation': 'relu'}
+                weights = []
+            elif kind == 'Normalization':
+                spec = {'kind': 'normalization'}
+                weights = weights[:2]
+            elif kind == 'BatchNormalization':
+                spec = {'kind': 'batch_normalization', 'epsilon': config.get('epsilon', 1e-3),
+                        'center': config.get('center', True), 'scale': config.get('scale', True)}
+            else:
+                raise ValueError(f'Layer {layer.name} of type {kind} is not supported by NumpyModel')
+            spec['weights'] = len(weights)
+            layers.append((spec, weights))
+        return cls(layers)
+
+    def __init__(self, layers):
+        self.layers = layers
+        for (spec, weights) in layers:
+            if spec.get('activation', 'linear') not in ACTIVATIONS:
+                raise ValueError(f'Activation {spec["activation"]} is not supported by NumpyModel')
+
+    def save(self, model_path):
+        arrays = {'layers': np.array(json.dumps([spec for (spec, weights) in self.layers]))}
+        for (i, (spec, weights)) in enumerate(self.layers):
+            for (j, w) in enumerate(weights):
+                arrays[f'layer_{i}_{j}'] = w
+        np.savez(model_path, **arrays)
+
+    def predict(self, inp):
+        x = np.asarray(inp, dtype=np.float32)
+        if x.ndim == 1:
+            x = x[None, :]
+        for (spec, weights) in self.layers:
+            kind = spec['kind']
+            if kind == 'dense':
+                x = x @ weights[0]
+                if spec['use_bias']:
+                    x = x + weights[1]
+                x = ACTIVATIONS[spec['activation']](x)
+            elif kind == 'activation':
+                x = ACTIVATIONS[spec['activation']](x)
+            elif kind == 'normalization':
+                mean, variance = weights
+                x = (x - mean) / np.maximum(np.sqrt(variance), np.float32(1e-7))
+            elif kind == 'batch_normalization':
+                weights = list(weights)
+                gamma = weights.pop(0) if spec['scale'] else np.float32(1)
+                beta = weights.pop(0) if spec['center'] else np.float32(0)
+                mean, variance = weights
+                x = (x - mean) / np.sqrt(variance + np.float32(spec['epsilon'])) * gamma + beta
+        return x.astype(np.float32, copy=False)
+
+    def predict_single(self, inp):
+        """ Like predict(), but only for a single record. The input data can be a Python list. """
+        return self.predict(np.array([inp]))[0]
+
+
+def _activation_name(activation):
+    if isinstance(activation, dict):
+        activation = activation.get('config', dict()).get('name', activation.get('class_name', 'linear'))
+    return str(activation).lower()
+
+
+def export_keras_model(model, model_path):
+    """
+    Dump the weights of a Keras model (or a path loadable by keras.models.load_model) to .npz
+    """
+    if isinstance(model, str):
+        from tensorflow import keras
+        model = keras.models.load_model(model)
+    NumpyModel.from_keras_model(model).save(model_path)
+    return model_path
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Export a dense Keras surrogate model for the NumPy runtime')
+    parser.add_argument('keras_model')
+    parser.add_argument('output')
+    options = parser.parse_args(args)
+    export_keras_model(options.keras_model, options.output)
+    print(f'Wrote {options.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,329 @@
+"""
+Gear optimizer: the loadouts (items and augment levels per slot) that maximize an objective such
+as XP/h or item X per hour at a zone, for Mining, Foraging or Fishing.
+
+Candidates come from EquipmentSet.matching_items. Items are compared as stat vectors (see
+idlescape.itemstats): items without any stat the skill reads are skipped, dominated items are
+pruned, and the search is a depth-first branch and bound whose bound evaluates the objective on
+the best stats still reachable. Complete loadouts are evaluated in batches, optionally on a
+process pool.
+
+    optimizer = GearOptimizer(Mining(player), zone='Clay Pit', max_augment=10, top_k=3)
+    for loadout in optimizer.search():
+        print(loadout.value, loadout.items)
+
+Pruning and bounding assume the objective never decreases when a gear stat increases. Skills list
+the stats it can decrease with in gear_nonmonotone_stats (rarity and effective level for Fishing).
+With any of them (or monotone=False) there is no bound, and options and partial loadouts are only
+dominated by ones with the same totals of those stats (of every stat with monotone=False), so the
+search stays exact. A warning is issued when it evaluates more than max_loadouts loadouts.
+"""
+import heapq
+import multiprocessing
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from copy import copy
+from dataclasses import dataclass
+
+import numpy as np
+
+from .character import EquipmentSet
+from .itemstats import BAIT, ITEM_SETS, SET_BONUS, STATS
+
+
+class ExperienceObjective:
+    """
+    Experience per hour at a zone (the best zone when zone is None)
+    """
+
+    def __init__(self, zone=None):
+        self.zone = zone
+
+    def __call__(self, action):
+        if self.zone is None:
+            return action.get_maximum_experience()
+        return action.zone_experience_rate(self.zone)
+
+
+class ItemObjective:
+    """
+    Items per hour of one item (id or name) at a zone
+    """
+
+    def __init__(self, item, zone):
+        self.item = item
+        self.zone = zone
+
+    def __call__(self, action):
+        item = self.item
+        if isinstance(item, str) and not item.isdigit():
+            item = action.game_data.item_ids_by_name[item]
+        evaluation = action.evaluate_zone(self.zone)
+        return evaluation.item_rates.get(int(item), 0) * evaluation.action_rate
+
+
+@dataclass(frozen=True)
+class Loadout:
+    """
+    Objective value, {slot: (item name, augment level)} of the searched slots and the resulting stats
+    """
+    value: float
+    items: dict
+    stats: dict
+
+    def equipment_set(self, item_data, base=None, game_data=None):
+        """
+        EquipmentSet with these items, other slots taken from base
+        """
+        kwargs = {'game_data': game_data}
+        if base is not None:
+            kwargs['game_data'] = game_data or base.game_data
+            for slot in base.slots:
+                kwargs[slot] = getattr(base, slot)
+                kwargs[f'{slot}_augment'] = getattr(base, f'{slot}_augment')
+        for (slot, (name, augment)) in self.items.items():
+            kwargs[slot] = name
+            kwargs[f'{slot}_augment'] = augment
+        return EquipmentSet(item_data, **kwargs)
+
+
+def evaluate_stats(action, objective, stats):
+    """
+    Objective for the player of `action` with its gear stats replaced by `stats`
+    """
+    player = action.player.snapshot()
+    player._reset_stats()
+    for (k, v) in stats.items():
+        setattr(player, k, v)
+    clone = copy(action)
+    clone.player = player
+    return objective(clone)
+
+
+_worker = dict()
+
+
+def _init_worker(action, objective):
+    _worker['action'] = action
+    _worker['objective'] = objective
+
+
+def _evaluate_worker(stats):
+    return evaluate_stats(_worker['action'], _worker['objective'], stats)
+
+
+class GearOptimizer:
+    def __init__(self, action, objective=None, **kwargs):
+        self.action = action
+        self.objective = objective if objective is not None else ExperienceObjective(kwargs.get("zone", None))
+        self.top_k = kwargs.get("top_k", 5)
+        self.max_augment = kwargs.get("max_augment", 0)
+        self.monotone = kwargs.get("monotone", len(action.gear_nonmonotone_stats) == 0)
+        self.max_loadouts = kwargs.get("max_loadouts", 100000)
+        self.workers = kwargs.get("workers", None)
+        self.batch_size = kwargs.get("batch_size", 64)
+        self.table = action.game_data.item_stats
+        self.base = action.player.equipment_set
+        if self.base is None:
+            self.base = EquipmentSet(action.player.item_data, game_data=action.player.game_data)
+        # Stats the action reads: vector layout is STATS, set membership, bait
+        relevant = set(action.fingerprint_attributes)
+        self.stat_mask = np.array([s in relevant for s in STATS])
+        self.set_mask = np.array([s in relevant for s in ITEM_SETS.values()])
+        self.bait_mask = np.array([s in relevant for s in BAIT])
+        # Stats that have to be equal for an option to dominate another
+        exact = () if self.monotone else (action.gear_nonmonotone_stats or STATS + tuple(BAIT))
+        self.exact_mask = np.concatenate([[s in exact for s in STATS], np.zeros(len(ITEM_SETS), dtype=bool),
+                                          [s in exact for s in BAIT]])
+        self.slots = kwargs.get("slots", None)
+        self.candidates = {slot: self._candidates(slot) for slot in (self.slots or self.base.slots)}
+        if self.slots is None:
+            self.slots = [slot for (slot, c) in self.candidates.items() if len(c) > 1]
+        self.evaluations = 0
+        self.pruned = 0
+
+    def _vector(self, row, augment):
+        t = self.table
+        return np.concatenate([(t.base[row] + augment * t.augment[row]) * self.stat_mask,
+                               t.sets[row] * self.set_mask, t.bait[row] * self.bait_mask])
+
+    def _candidates(self, slot):
+        """
+        (name, augment, row, vector) options of a slot: nothing, and every relevant item at each
+        augment level, without dominated options
+        """
+        options = []
+        for name in self.base.matching_items(slot, flip=True):
+            row = self.table.row_by_name.get(name, self.table.missing)
+            augments = range(self.max_augment + 1) if self.table.augment[row][self.stat_mask].any() else [0]
+            for augment in augments:
+                vector = self._vector(row, augment)
+                if vector.any():
+                    options.append((name, augment, row, vector))
+        options = self._prune(options)
+        return [(None, 0, self.table.missing, np.zeros(len(STATS) + len(ITEM_SETS) + len(BAIT)))] + options
+
+    def _prune(self, options):
+        return [options[i] for i in self._undominated([option[3] for option in options])]
+
+    def _undominated(self, vectors):
+        """
+        Indices of the vectors that no other vector with the same set membership and exact_mask stats
+        dominates (at least as large in every stat). Of identical vectors the first one is kept.
+        """
+        key_mask = self.exact_mask.copy()
+        key_mask[len(STATS):len(STATS) + len(ITEM_SETS)] = True
+        groups = dict()
+        for (i, vector) in enumerate(vectors):
+            # + 0.0: -0.0 and 0.0 are the same key
+            groups.setdefault((vector[key_mask] + 0.0).tobytes(), []).append(i)
+        kept = []
+        for group in groups.values():
+            block = np.array([vectors[i] for i in group])
+            for (a, i) in enumerate(group):
+                at_least = (block >= block[a]).all(axis=1)
+                equal = (block == block[a]).all(axis=1)
+                if not ((at_least & ~equal).any() or equal[:a].any()):
+                    kept.append(i)
+        return sorted(kept)
+
+    def _exhaustive_choices(self, order):
+        """
+        Complete loadouts of an exhaustive search, built slot by slot. The objective only depends on
+        the stat totals, so a partial loadout is dropped when another one dominates its totals.
+        """
+        frontier = [(dict(), np.zeros(len(STATS) + len(ITEM_SETS) + len(BAIT)))]
+        for slot in order:
+            frontier = [({**choice, slot: option}, total + option[3])
+                        for (choice, total) in frontier for option in self.candidates[slot]]
+            kept = self._undominated([total for (choice, total) in frontier])
+            self.pruned += len(frontier) - len(kept)
+            frontier = [frontier[i] for i in kept]
+        return [choice for (choice, total) in frontier]
+
+    # Stats of (partial) loadouts
+    def _rows(self, choice):
+        rows = []
+        augments = []
+        for slot in self.base.slots:
+            if slot in choice:
+                (name, augment, row, vector) = choice[slot]
+            else:
+                row = self.table.row_by_name.get(str(getattr(self.base, slot)), self.table.missing)
+                augment = int(getattr(self.base, f'{slot}_augment'))
+            rows.append(row)
+            augments.append(augment)
+        return rows, augments
+
+    def _bound_stats(self, choice, remaining):
+        """
+        Best stats reachable from a partial loadout: every remaining slot adds its largest value of
+        each stat, set bonuses and bait take their best reachable values
+        """
+        rows, augments = self._rows(choice)
+        fixed = [i for (i, slot) in enumerate(self.base.slots) if slot not in remaining]
+        rows = np.array(rows)[fixed]
+        augments = np.array(augments, dtype=float)[fixed]
+        stats = self.table.base[rows].sum(axis=0) + np.dot(augments, self.table.augment[rows])
+        set_counts = self.table.sets[rows].sum(axis=0)
+        bait = self.table.bait[rows].max(axis=0)
+        extra_sets = np.zeros(len(ITEM_SETS), dtype=np.int64)
+        for slot in remaining:
+            options = np.array([c[3] for c in self.candidates[slot]])
+            stats = stats + options[:, :len(STATS)].max(axis=0)
+            extra_sets += options[:, len(STATS):len(STATS) + len(ITEM_SETS)].max(axis=0).astype(np.int64)
+            bait = np.maximum(bait, self.table.bait[[c[2] for c in self.candidates[slot]]].max(axis=0))
+        ret = dict(zip(STATS, stats.tolist()))
+        for (i, name) in enumerate(ITEM_SETS.values()):
+            reachable = range(set_counts[i], set_counts[i] + extra_sets[i] + 1)
+            ret[name] = max([SET_BONUS.get(n, 0.0) for n in reachable])
+        ret.update(zip(BAIT, bait.tolist()))
+        return ret
+
+    def _leaf_stats(self, choices):
+        pairs = [self._rows(choice) for choice in choices]
+        tally = self.table.tally_rows(np.array([r for (r, a) in pairs]),
+                                      np.array([a for (r, a) in pairs], dtype=float))
+        ret = []
+        for i in range(len(choices)):
+            stats = {k: float(v[i]) for (k, v) in tally.items()}
+            ret.append({k: v for (k, v) in stats.items() if not np.isnan(v)})
+        return ret
+
+    def _evaluate(self, stats_list, executor):
+        self.evaluations += len(stats_list)
+        if executor is None:
+            return [evaluate_stats(self.action, self.objective, stats) for stats in stats_list]
+        return list(executor.map(_evaluate_worker, stats_list, chunksize=max(1, len(stats_list) // self.workers)))
+
+    def search(self):
+        """
+        The top_k loadouts, best first. Loadouts built from dominated options (e.g. the same item at a
+        lower augment level) are never candidates, so the runners up are genuine alternatives.
+        """
+        self.evaluations = 0
+        self.pruned = 0
+        executor = None
+        if self.workers is not None and self.workers > 1:
+            # spawn: forking after numba's threading layer has started is not safe
+            executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'),
+                                           initializer=_init_worker, initargs=(self.action, self.objective))
+        # Slots with the largest stat spread first, so the bound tightens early
+        order = sorted(self.slots, key=lambda s: -max(np.abs(c[3]).sum() for c in self.candidates[s]))
+        best = []  # min-heap of (value, counter, loadout)
+        counter = [0]
+        pending = []
+
+        def threshold():
+            return best[0][0] if len(best) >= self.top_k else -np.inf
+
+        def flush():
+            if len(pending) == 0:
+                return
+            stats_list = self._leaf_stats([choice for choice in pending])
+            for (choice, stats, value) in zip(pending, stats_list, self._evaluate(stats_list, executor)):
+                items = {slot: (c[0], c[1]) for (slot, c) in choice.items() if c[0] is not None}
+                counter[0] += 1
+                entry = (value, counter[0], Loadout(float(value), items, stats))
+                if len(best) < self.top_k:
+                    heapq.heappush(best, entry)
+                elif value > best[0][0]:
+                    heapq.heapreplace(best, entry)
+            pending.clear()
+
+        def descend(depth, choice):
+            if depth == len(order):
+                pending.append(dict(choice))
+                if len(pending) >= self.batch_size:
+                    flush()
+                return
+            if self.monotone and depth > 0 and len(best) >= self.top_k:
+                bound = evaluate_stats(self.action, self.objective, self._bound_stats(choice, order[depth:]))
+                self.evaluations += 1
+                if bound <= threshold():
+                    self.pruned += 1
+                    return
+            slot = order[depth]
+            # Most promising options first
+            for option in sorted(self.candidates[slot], key=lambda c: -c[3].sum()):
+                choice[slot] = option
+                descend(depth + 1, choice)
+            del choice[slot]
+
+        try:
+            if self.monotone:
+                descend(0, dict())
+            else:
+                choices = self._exhaustive_choices(order)
+                if len(choices) > self.max_loadouts:
+                    warnings.warn(f'Exhaustive gear search over {len(choices)} loadouts (max_loadouts='
+                                  f'{self.max_loadouts}): restrict slots or max_augment')
+                for choice in choices:
+                    pending.append(choice)
+                    if len(pending) >= self.batch_size:
+                        flush()
+            flush()
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        return [entry[2] for entry in sorted(best, key=lambda e: (-e[0], e[1]))]
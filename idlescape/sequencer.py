@@ -1,5 +1,5 @@
 import numpy as np
-from copy import copy, deepcopy
+from copy import copy
 
 
 class Sequencer:
@@ -32,15 +32,28 @@ class Sequencer:
         self.hour_sequencer = sorted(self.hour_sequencer, key=lambda x: x['hours'])
 
     def simulate_by_time(self, time_axis, **kwargs):
+        """
+        Level and experience rate (per hour) at each time in time_axis (hours). Every entry covers
+        one step starting at its time: the rate is the one in effect at the start of the step and the
+        level the one reached at its end.
+        With event_driven=True the rate is only re-evaluated at level-ups and sequence
+        triggers, where it can change, and the result is sampled onto time_axis the same way.
+        The fixed-step loop holds a new rate until the next step and applies hour triggers one step
+        late, so its curve lags the event-driven one by up to a step at every change.
+        """
         level_axis = []
         custom_xp = kwargs.get('custom_xp', False)
+        event_driven = kwargs.get('event_driven', False)
         xp_gen = ExperienceTable() if custom_xp else RSExperienceTable()
         action_clone = copy(self.action)
-        player_clone = deepcopy(self.player)
+        player_clone = self.player.snapshot()
         action_clone.player = player_clone
         hour_sequencer = copy(self.hour_sequencer)
         level_sequencer = copy(self.level_sequencer)
         delta_t = time_axis[1] - time_axis[0]
+        if event_driven:
+            return self._simulate_by_events(time_axis, delta_t, xp_gen, action_clone, player_clone, hour_sequencer,
+                                            level_sequencer)
         experience_rate = []
         sequence_log = []
         total_experience = 0
@@ -53,32 +66,76 @@ class Sequencer:
             setattr(player_clone, self.action_type, current_level)
             level_axis.append(current_level)
             # Check sequencer for events
-            for hour_sequence in hour_sequencer:
-                if hour_sequence['hours'] <= timer:
-                    for (k, v) in hour_sequence.items():
-                        if (k != 'hours') and (k != 'info'):
-                            if 'enchantments' in k:
-                                subkey = k.split(':')[-1]
-                                player_clone.enchantments[subkey] = max(player_clone.enchantments.get(subkey, 0), v)
-                            else:
-                                setattr(player_clone, k, max(getattr(player_clone, k), v))
-            for level_sequence in level_sequencer:
-                if level_sequence['level'] <= current_level:
-                    for (k, v) in level_sequence.items():
-                        if (k != 'level') and (k != 'info'):
-                            if 'enchantments' in k:
-                                subkey = k.split(':')[-1]
-                                player_clone.enchantments[subkey] = max(player_clone.enchantments.get(subkey, 0), v)
-                            else:
-                                setattr(player_clone, k, max(getattr(player_clone, k), v))
+            self._apply_sequences(player_clone, timer, current_level, hour_sequencer, level_sequencer)
         level_axis = np.array(level_axis)
         experience_rate = np.array(experience_rate)
         return level_axis, experience_rate, sequence_log
 
+    def _simulate_by_events(self, time_axis, delta_t, xp_gen, action_clone, player_clone, hour_sequencer,
+                            level_sequencer):
+        """
+        Experience rate is constant between level-ups and hour triggers, so jump straight
+        from one to the next
+        """
+        timer = time_axis[0]
+        end_time = time_axis[-1] + delta_t
+        total_experience = 0
+        current_level = xp_gen.level(total_experience)
+        event_times = []
+        event_levels = []
+        event_rates = []
+        sequence_log = []
+        while True:
+            setattr(player_clone, self.action_type, current_level)
+            self._apply_sequences(player_clone, timer, current_level, hour_sequencer, level_sequencer)
+            current_experience_rate = action_clone.get_maximum_experience()
+            event_times.append(timer)
+            event_levels.append(current_level)
+            event_rates.append(current_experience_rate)
+            if timer >= end_time:
+                break
+            # Next level boundary or hour trigger, whichever comes first
+            next_experience = total_experience + xp_gen.experience_to_next_level(total_experience)
+            level_up_time = timer + (next_experience - total_experience) / current_experience_rate \
+                if current_experience_rate > 0 else np.inf
+            next_hours = [seq['hours'] for seq in hour_sequencer if seq['hours'] > timer]
+            next_timer = min([level_up_time, end_time] + next_hours)
+            total_experience += current_experience_rate * (next_timer - timer)
+            if next_timer == level_up_time:
+                total_experience = max(total_experience, next_experience)
+            timer = next_timer
+            current_level = xp_gen.level(total_experience)
+        # Rate at the start of each step, level at its end (as in the fixed-step loop)
+        index = np.clip(np.searchsorted(event_times, time_axis, side='right') - 1, 0, None)
+        experience_rate = np.array(event_rates)[index]
+        index = np.clip(np.searchsorted(event_times, np.asarray(time_axis) + delta_t, side='right') - 1, 0, None)
+        level_axis = np.array(event_levels)[index]
+        return level_axis, experience_rate, sequence_log
+
+    @staticmethod
+    def _apply_sequences(player, timer, level, hour_sequencer, level_sequencer):
+        for hour_sequence in hour_sequencer:
+            if hour_sequence['hours'] <= timer:
+                Sequencer._apply_sequence(player, hour_sequence, 'hours')
+        for level_sequence in level_sequencer:
+            if level_sequence['level'] <= level:
+                Sequencer._apply_sequence(player, level_sequence, 'level')
+
+    @staticmethod
+    def _apply_sequence(player, sequence, trigger):
+        for (k, v) in sequence.items():
+            if (k != trigger) and (k != 'info'):
+                if 'enchantments' in k:
+                    subkey = k.split(':')[-1]
+                    player.enchantments[subkey] = max(player.enchantments.get(subkey, 0), v)
+                else:
+                    setattr(player, k, max(getattr(player, k), v))
+
 
 class ExperienceTable:
     """
     Generate the RS xp table
+    Lookups take scalars or arrays.
     """
 
     def __init__(self):
@@ -88,13 +145,43 @@ class ExperienceTable:
                     (self.levels - 101) / 2) ** 3))
 
     def experience(self, level):
-        return self.total_xp[level == self.levels][0]
+        """
+        Total experience at which level is reached
+        """
+        index = np.asarray(level).astype(np.int64) - self.levels[0]
+        if np.any((index < 0) | (index >= len(self.levels))):
+            raise IndexError(f'{level} outside of levels {self.levels[0]} to {self.levels[-1]}')
+        return self.total_xp[index]
 
     def level(self, experience):
-        return self.levels[experience >= self.total_xp][-1]
+        index = np.searchsorted(self.total_xp, experience, side='right') - 1
+        return self.levels[np.clip(index, 0, None)]
+
+    def experience_to_next_level(self, experience):
+        """
+        Experience remaining until the next level (inf at the maximum level)
+        """
+        index = np.searchsorted(self.total_xp, experience, side='right')
+        return np.append(self.total_xp, np.inf)[index] - np.asarray(experience)
 
+    def hours_to_level(self, level, rate, experience=0):
+        """
+        Hours to go from `experience` to `level`. `rate` is experience per hour, either a
+        constant or a profile with one rate per level (the rate while at that level).
+        """
+        rate = np.broadcast_to(np.asarray(rate, dtype=np.float64), self.levels.shape)
+        upper = np.append(self.total_xp[1:], np.inf)
+        span = np.clip(upper - np.maximum(self.total_xp, experience), 0, None)
+        hours = np.divide(span, rate, out=np.full(span.shape, np.inf), where=(rate > 0))
+        hours[span == 0] = 0
+        cumulative_hours = np.concatenate([[0], np.cumsum(hours)])
+        index = np.asarray(level).astype(np.int64) - self.levels[0]
+        if np.any((index < 0) | (index >= len(self.levels))):
+            raise IndexError(f'{level} outside of levels {self.levels[0]} to {self.levels[-1]}')
+        return cumulative_hours[index]
 
-class RSExperienceTable:
+
+class RSExperienceTable(ExperienceTable):
     """
     Generate the RS xp table
     """
@@ -104,9 +191,3 @@ class RSExperienceTable:
         self.delta = np.roll(0.25 * np.floor((self.levels - 1 + 300 * 2 ** ((self.levels - 1) / 7))), 1)
         self.delta[0] = 0
         self.total_xp = np.floor(np.cumsum(self.delta))
-
-    def experience(self, level):
-        return self.total_xp[level == self.levels][0]
-
-    def level(self, experience):
-        return self.levels[experience >= self.total_xp][-1]
@@ -1,12 +1,12 @@
-import json
 import numpy as np
+from .gamedata import GameData
 
 
 class Smithing:
-    def __init__(self, character, forge_list, **kwargs):
-        with open(forge_list) as json_file:
-            self.forges = json.load(json_file)
+    def __init__(self, character, forge_list=None, **kwargs):
         self.player = character
+        self.game_data = GameData.resolve(forge_list, self.player.game_data, field='forge_file')
+        self.forges = self.game_data.forges
 
     def information(self, forge, bar, intensity):
         level = self.player.smithing_level
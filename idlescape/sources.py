@@ -0,0 +1,75 @@
+"""
+Reverse item index: where each item drops, and the fastest places to get it at a character's stats.
+
+    for source in best_sources('Copper Ore', player, top_k=3):
+        print(source.skill, source.location, source.rate)
+"""
+from collections import namedtuple
+
+from .gamedata import GameData
+
+# Loot entry (or superheated loot entry) that yields an item
+Source = namedtuple('Source', ['skill', 'location', 'node', 'loot'])
+# Items per hour of an item at a location
+ItemSource = namedtuple('ItemSource', ['skill', 'location', 'rate'])
+
+
+def gathering_skills():
+    from .fishing import Fishing
+    from .foraging import Foraging
+    from .mining import Mining
+    return {cls.__name__: cls for cls in (Mining, Foraging, Fishing)}
+
+
+class ItemSourceIndex:
+    """
+    item id -> Source entries of every gathering location, superheated outputs (Mining.sh_table)
+    included, built once per GameData (see GameData.item_sources)
+    """
+
+    def __init__(self, game_data):
+        self.sources = dict()
+        for (skill, cls) in gathering_skills().items():
+            table = game_data.location_table(cls.action_type)
+            sh_table = cls.sh_table if isinstance(cls.sh_table, dict) else dict()
+            for (node, item) in zip(table.loot_node.tolist(), table.loot_item.tolist()):
+                location = table.names[table.node_location[node]]
+                source = Source(skill, location, table.node_ids[node], item)
+                self.sources.setdefault(item, []).append(source)
+                if item in sh_table:
+                    self.sources.setdefault(sh_table[item], []).append(source)
+
+    def __getitem__(self, item):
+        return list(self.sources.get(int(item), []))
+
+    def __contains__(self, item):
+        return int(item) in self.sources
+
+    def locations(self, item):
+        """
+        Distinct (skill, location) pairs yielding an item
+        """
+        return list(dict.fromkeys((s.skill, s.location) for s in self.sources.get(int(item), [])))
+
+
+def best_sources(item, character, top_k=5, **kwargs):
+    """
+    The top_k locations for an item (id or name) by items per hour at the character's stats, best
+    first. Only the locations yielding the item are evaluated; kwargs go to the gathering classes
+    (e.g. backend for Fishing). Locations the character cannot use are left out.
+    """
+    game_data = GameData.resolve(kwargs.pop("game_data", None), character.game_data)
+    if isinstance(item, str) and not item.isdigit():
+        item = game_data.item_ids_by_name[item]
+    item = int(item)
+    skills = gathering_skills()
+    actions = dict()
+    ret = []
+    for (skill, location) in game_data.item_sources.locations(item):
+        if skill not in actions:
+            actions[skill] = skills[skill](character, game_data, **kwargs)
+        evaluation = actions[skill].evaluate_zone(location)
+        rate = float(evaluation.item_rates.get(item, 0) * evaluation.action_rate)
+        if rate > 0:
+            ret.append(ItemSource(skill, location, rate))
+    return sorted(ret, key=lambda s: -s.rate)[:top_k]
@@ -0,0 +1,116 @@
+"""
+Process-wide registry of the fishing surrogate models (castnet and driftwood).
+
+Each model file is loaded once per process and shared by every Fishing instance. The TFLite
+flatbuffer converted from a Keras castnet model is cached on disk, keyed by the hash of the model
+files, so the Keras conversion only happens the first time a model is seen. The cache lives in
+$IDLESCAPE_CACHE_DIR (default ~/.cache/idlescape).
+"""
+import hashlib
+import os
+import threading
+
+CASTNET_TRIALS = 'Castnet_Trials'
+CASTNET_RESOURCES = 'Castnet_CalcResource'
+DRIFTWOOD_TRIALS = 'AvgTrials.pkl'
+DRIFTWOOD_RESOURCES = 'CalcResources.pkl'
+
+_models = dict()
+_lock = threading.Lock()
+
+
+def cache_dir():
+    path = os.environ.get('IDLESCAPE_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'idlescape'))
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def model_hash(path):
+    """
+    sha256 of a model file, or of every file in a model directory (Keras SavedModel)
+    """
+    digest = hashlib.sha256()
+    if os.path.isdir(path):
+        for (root, dirs, files) in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                full = os.path.join(root, name)
+                digest.update(os.path.relpath(full, path).encode())
+                with open(full, 'rb') as ff:
+                    digest.update(ff.read())
+    else:
+        with open(path, 'rb') as ff:
+            digest.update(ff.read())
+    return digest.hexdigest()
+
+
+def _load(kind, path, loader):
+    path = os.path.abspath(path)
+    key = (kind, path, model_hash(path))
+    with _lock:
+        model = _models.get(key, None)
+        if model is None:
+            model = loader(path, key[2])
+            _models[key] = model
+    return model
+
+
+def _write_atomic(path, content):
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as ff:
+        ff.write(content)
+    os.replace(tmp, path)
+
+
+def _load_tflite(path, digest):
+    from .litemodel import LiteModel
+    cached = os.path.join(cache_dir(), f'{digest}.tflite')
+    if not os.path.exists(cached):
+        import tensorflow as tf
+        kmodel = tf.keras.models.load_model(path)
+        _write_atomic(cached, tf.lite.TFLiteConverter.from_keras_model(kmodel).convert())
+    return LiteModel.from_file(cached)
+
+
+def _load_numpy(path, digest):
+    from .numpymodel import NumpyModel, export_keras_model
+    if path.endswith('.npz'):
+        return NumpyModel.from_file(path)
+    cached = os.path.join(cache_dir(), f'{digest}.npz')
+    if not os.path.exists(cached):
+        tmp = f'{cached[:-4]}.{os.getpid()}.tmp.npz'
+        export_keras_model(path, tmp)
+        os.replace(tmp, cached)
+    return NumpyModel.from_file(cached)
+
+
+def _load_joblib(path, digest):
+    import joblib
+    return joblib.load(path)
+
+
+def castnet_model(path, runtime='tflite'):
+    """
+    Shared castnet model for `path`. runtime is 'tflite' (LiteModel) or 'numpy' (NumpyModel); a
+    Keras model given to the numpy runtime is exported to .npz once and cached.
+    """
+    if runtime == 'tflite':
+        return _load('tflite', path, _load_tflite)
+    elif runtime == 'numpy':
+        return _load('numpy', path, _load_numpy)
+    raise ValueError(f'Unknown castnet runtime {runtime}')
+
+
+def driftwood_model(path):
+    """
+    Shared driftwood (joblib) model for `path`
+    """
+    return _load('joblib', path, _load_joblib)
+
+
+def clear():
+    """
+    Forget the loaded models (the on-disk cache is kept)
+    """
+    with _lock:
+        _models.clear()
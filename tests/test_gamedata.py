@@ -0,0 +1,22 @@
+import os
+
+from idlescape.character import Character, EquipmentSet
+from idlescape.gamedata import GameData
+
+DATA = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+
+def test_for_items_skips_unloaded_instances(tmp_path):
+    GameData.load(item_file=os.path.join(tmp_path, 'missing.json'))
+    game_data = GameData.load(item_file=os.path.join(DATA, 'items.json'))
+    equipment = EquipmentSet(game_data.items)
+    assert len(equipment.matching_items('pickaxe')) > 0
+    assert equipment.game_data is game_data
+
+
+def test_assign_equipment_sets_game_data():
+    game_data = GameData.load(item_file=os.path.join(DATA, 'items.json'))
+    character = Character(game_data=game_data)
+    equipment = EquipmentSet(character.item_data)
+    character.assign_equipment(equipment)
+    assert equipment.game_data is game_data
@@ -0,0 +1,64 @@
+import os
+
+import numpy as np
+import pytest
+
+from idlescape.character import Character, EquipmentSet
+from idlescape.fishing import Fishing
+from idlescape.foraging import Foraging
+from idlescape.gamedata import GameData
+from idlescape.mining import Mining
+from idlescape.sequencer import Sequencer
+
+DATA = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+
+@pytest.fixture(scope='module')
+def game_data():
+    return GameData.load(item_file=os.path.join(DATA, 'items.json'),
+                         location_file=os.path.join(DATA, 'locations.json'))
+
+
+def player(game_data, **kwargs):
+    character = Character(game_data=game_data, enchantments={'fishingMagnetism': 0}, **kwargs)
+    character.assign_equipment(EquipmentSet(game_data.items, game_data=game_data))
+    return character
+
+
+@pytest.mark.parametrize('skill, kwargs, zone', [
+    (Fishing, {'backend': 'exact'}, 'Lazy River'),
+    (Foraging, {}, 'Grasslands'),
+])
+def test_mining_enchant_keeps_other_skills_cached(game_data, skill, kwargs, zone):
+    character = player(game_data, fishing_level=60, foraging_level=60)
+    action = skill(character, **kwargs)
+    evaluation = action.evaluate_zone(zone)
+    rates = action.experience_rates()
+    character.enchantments['superheating'] = 3
+    character.enchantments['empoweredSuperheating'] = 2
+    assert action.evaluate_zone(zone) is evaluation
+    assert action.experience_rates() is rates
+    assert action.cache_info().hits == 2
+    assert action.cache_info().misses == 2
+
+
+def test_mining_enchant_changes_mining_fingerprint(game_data):
+    character = player(game_data, mining_level=60)
+    action = Mining(character)
+    action.evaluate_zone('Clay Pit')
+    character.enchantments['superheating'] = 3
+    action.evaluate_zone('Clay Pit')
+    assert action.cache_info().misses == 2
+
+
+def test_sequencer_steps_hit_the_cache(game_data):
+    action = Mining(player(game_data))
+    sequencer = Sequencer(action, sequence=[{'level': 20, 'mining_bonus': 20}])
+    time_axis = np.linspace(0, 100, 201)
+    (levels, _, _) = sequencer.simulate_by_time(time_axis)
+    info = action.cache_info()
+    # One evaluation per distinct level (and bonus), every other step is a lookup
+    assert info.misses == len(np.unique(levels)) + 1
+    assert info.hits == len(time_axis) - info.misses
+    sequencer.simulate_by_time(time_axis)
+    assert action.cache_info().misses == info.misses
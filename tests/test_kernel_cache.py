@@ -0,0 +1,30 @@
+import os
+
+from idlescape.kernel_cache import KernelCache
+
+
+def used(cache, key):
+    return cache.connection.execute('SELECT used FROM results WHERE key = ?', (key,)).fetchone()[0]
+
+
+def test_creates_parent_directory(tmp_path):
+    cache = KernelCache(os.path.join(tmp_path, 'new', 'kernels.sqlite'))
+    cache.put_many({'a': (1.0, 0.0)})
+    assert cache.get_many(['a', 'b']) == {'a': (1.0, 0.0)}
+
+
+def test_reads_only_touch_stale_entries(tmp_path):
+    cache = KernelCache(os.path.join(tmp_path, 'kernels.sqlite'), touch_interval=60)
+    cache.put_many({'fresh': (1.0, 0.0), 'stale': (2.0, 0.0)})
+    with cache.connection as connection:
+        connection.execute('UPDATE results SET used = used - 120 WHERE key = ?', ('stale',))
+    (fresh, stale) = (used(cache, 'fresh'), used(cache, 'stale'))
+    cache.get_many(['fresh', 'stale'])
+    assert used(cache, 'fresh') == fresh
+    assert used(cache, 'stale') > stale + 60
+    cache.touch_interval = None
+    with cache.connection as connection:
+        connection.execute('UPDATE results SET used = used - 120 WHERE key = ?', ('stale',))
+    stale = used(cache, 'stale')
+    cache.get_many(['stale'])
+    assert used(cache, 'stale') == stale
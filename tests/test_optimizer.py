@@ -0,0 +1,90 @@
+import itertools
+import os
+from copy import copy
+
+import pytest
+
+from idlescape.character import Character, EquipmentSet
+from idlescape.fishing import Fishing
+from idlescape.foraging import Foraging
+from idlescape.gamedata import GameData
+from idlescape.mining import Mining
+from idlescape.optimizer import ExperienceObjective, GearOptimizer, ItemObjective
+
+DATA = os.path.join(os.path.dirname(__file__), '..', 'data')
+# Most of the loadouts: the first leaves tie with the best ones, so a small top_k hides over-pruning
+TOP_K = 20
+
+
+@pytest.fixture(scope='module')
+def game_data():
+    return GameData.load(item_file=os.path.join(DATA, 'items.json'),
+                         location_file=os.path.join(DATA, 'locations.json'),
+                         forge_file=os.path.join(DATA, 'forges.json'))
+
+
+def player(game_data, **kwargs):
+    character = Character(game_data=game_data, enchantments={'fishingMagnetism': 0}, **kwargs)
+    character.assign_equipment(EquipmentSet(game_data.items, game_data=game_data))
+    return character
+
+
+def brute_force(optimizer, objective):
+    """
+    Objective of every combination of the optimizer's candidates, best first
+    """
+    action = optimizer.action
+    ret = []
+    for combination in itertools.product(*[optimizer.candidates[slot] for slot in optimizer.slots]):
+        kwargs = dict()
+        for (slot, (name, augment, row, vector)) in zip(optimizer.slots, combination):
+            kwargs[slot] = name
+            kwargs[f'{slot}_augment'] = augment
+        clone = copy(action)
+        clone.player = action.player.snapshot()
+        clone.player.assign_equipment(EquipmentSet(action.game_data.items, game_data=action.game_data, **kwargs))
+        ret.append(objective(clone))
+    return sorted(ret, reverse=True)
+
+
+def check(action, objective):
+    # batch_size=1: the top loadouts are known early, so the bound prunes even on small searches
+    pruned = GearOptimizer(action, objective, max_augment=2, top_k=TOP_K, batch_size=1)
+    result = [loadout.value for loadout in pruned.search()]
+    assert pruned.pruned > 0
+    # Branch and bound finds the top loadouts of the (dominance pruned) candidates
+    assert result == pytest.approx(brute_force(pruned, objective)[:TOP_K])
+    # Dominance pruning never loses the best loadout
+    exhaustive = GearOptimizer(action, objective, max_augment=2, top_k=1, monotone=False)
+    assert result[0] == pytest.approx(exhaustive.search()[0].value)
+
+
+@pytest.mark.parametrize('level, zone', [(40, 'Village Quarry'), (70, 'Underground Mine')])
+def test_pruned_search_matches_exhaustive_mining(game_data, level, zone):
+    check(Mining(player(game_data, mining_level=level)), ExperienceObjective(zone))
+
+
+def test_pruned_search_matches_exhaustive_foraging(game_data):
+    check(Foraging(player(game_data, foraging_level=60)), ItemObjective('Log', 'Grasslands'))
+
+
+@pytest.mark.parametrize('level, objective', [
+    (60, ExperienceObjective('Lazy River')),
+    # Rarity and effective level lower this item's rate: pruning as if monotone misses the best loadout
+    (80, ItemObjective('Raw Magnetic Minnow', 'Still Lake')),
+])
+def test_fishing_search_matches_brute_force(game_data, level, objective):
+    action = Fishing(player(game_data, fishing_level=level), backend='exact')
+    optimizer = GearOptimizer(action, objective, top_k=3, batch_size=16)
+    result = [loadout.value for loadout in optimizer.search()]
+    assert optimizer.pruned > 0
+    # Dominated partial loadouts are dropped, so the runners up can skip some brute force values
+    values = brute_force(optimizer, objective)
+    assert result[0] == pytest.approx(values[0])
+    assert all(any(v == pytest.approx(value) for value in values) for v in result)
+
+
+def test_fishing_search_is_exhaustive_by_default(game_data):
+    action = Fishing(player(game_data, fishing_level=60), backend='exact')
+    assert not GearOptimizer(action, zone='Lazy River').monotone
+    assert GearOptimizer(Mining(action.player), zone='Clay Pit').monotone
@@ -0,0 +1,37 @@
+import os
+
+import numpy as np
+import pytest
+
+from idlescape.character import Character, EquipmentSet
+from idlescape.gamedata import GameData
+from idlescape.mining import Mining
+from idlescape.sequencer import Sequencer
+
+DATA = os.path.join(os.path.dirname(__file__), '..', 'data')
+SEQUENCE = [{'level': 20, 'mining_bonus': 20}, {'level': 60, 'mining_bonus': 40}, {'hours': 300, 'mining_bonus': 60}]
+
+
+@pytest.fixture(scope='module')
+def game_data():
+    return GameData.load(item_file=os.path.join(DATA, 'items.json'),
+                         location_file=os.path.join(DATA, 'locations.json'))
+
+
+@pytest.fixture
+def sequencer(game_data):
+    character = Character(game_data=game_data, enchantments=dict())
+    character.assign_equipment(EquipmentSet(game_data.items, game_data=game_data))
+    return Sequencer(Mining(character), sequence=SEQUENCE)
+
+
+def test_event_driven_matches_fixed_steps(sequencer):
+    time_axis = np.linspace(0, 1000, 2001)
+    (levels, rates, _) = sequencer.simulate_by_time(time_axis)
+    (event_levels, event_rates, _) = sequencer.simulate_by_time(time_axis, event_driven=True)
+    # The fixed steps lag by up to a step at every level-up and trigger: within a level, and
+    # different only around the changes
+    assert np.abs(levels - event_levels).max() <= 1
+    assert np.mean(levels != event_levels) < 0.05
+    assert np.mean(~np.isclose(rates, event_rates)) < 0.05
+    assert levels[-1] == event_levels[-1]